@@ -14,7 +14,10 @@ mail = Mail()
 def create_app(config_name='default'):
     """Application factory pattern"""
     app = Flask(__name__)
-    
+    # Uploads stream to disk and are checked as they arrive (utils.uploads)
+    from utils.uploads import UploadRequest
+    app.request_class = UploadRequest
+
     # Load configuration
     app.config.from_object(config[config_name])
     config[config_name].init_app(app)
@@ -25,6 +28,42 @@ def create_app(config_name='default'):
     migrate.init_app(app, db)
     mail.init_app(app)
     
+    # One pooled MySQL connection per request, released at teardown
+    from utils.db import add_server_timing, release_request_connection
+    app.teardown_appcontext(release_request_connection)
+    app.after_request(add_server_timing)
+
+    # Anonymous full-page cache; hits are answered before any view runs
+    from utils.page_cache import flush_page_invalidation, serve_cached_page, store_page
+    app.before_request(serve_cached_page)
+    app.after_request(store_page)
+    app.teardown_request(flush_page_invalidation)
+
+    # sitemap.xml files cached on disk, dropped after committed writes
+    from services.sitemap import flush_sitemap_invalidation
+    app.teardown_request(flush_sitemap_invalidation)
+
+    # {% cache %} fragment tag for the card and navbar partials
+    from utils.fragment_cache import FragmentCacheExtension, add_fragment_timing
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.after_request(add_fragment_timing)
+
+    # /static/uploads/ is served with strong ETags, ranges and optional
+    # X-Sendfile/X-Accel-Redirect; content-addressed uploads are cached forever
+    from utils.media_serving import static_view
+    app.view_functions['static'] = static_view
+    from utils.media_store import add_upload_cache_headers
+    app.after_request(add_upload_cache_headers)
+
+    # srcset for uploaded images (_partials/_media.html)
+    from utils.images import media_variants_filter, srcset_filter
+    app.jinja_env.filters['media_variants'] = media_variants_filter
+    app.jinja_env.filters['srcset'] = srcset_filter
+
+    # Compiled templates persist across worker spawns
+    from utils.templating import init_bytecode_cache, warm_templates
+    init_bytecode_cache(app)
+
     # Register context processors
     from utils.helpers import fetch_categories, fetch_plans
     app.context_processor(lambda: {'logo_path': url_for('static', filename='img/icons/dunislogo_128.png')})
@@ -34,14 +73,36 @@ def create_app(config_name='default'):
     
     # Register blueprints
     with app.app_context():
-        from routes import categories, index, auth, business, admin, user
+        from routes import categories, index, auth, business, admin, user, sitemap, export
         app.register_blueprint(index.bp)
         app.register_blueprint(categories.bp)
         app.register_blueprint(auth.bp)
         app.register_blueprint(business.bp)
         app.register_blueprint(admin.bp)
         app.register_blueprint(user.bp)
+        app.register_blueprint(sitemap.bp)
+        app.register_blueprint(export.bp)
         # app.register_blueprint(user.admin)
+
+    # Register CLI commands
+    from services.counters import counters_cli
+    from services.export import export_cli
+    from services.listing import listings_cli
+    from services.media import media_cli
+    from services.outbox import outbox_cli
+    from services.recommend import recommend_cli
+    from services.slugs import slugs_cli
+    app.cli.add_command(counters_cli)
+    app.cli.add_command(export_cli)
+    app.cli.add_command(listings_cli)
+    app.cli.add_command(media_cli)
+    app.cli.add_command(outbox_cli)
+    app.cli.add_command(recommend_cli)
+    app.cli.add_command(slugs_cli)
+
+    # Needs every blueprint registered so their templates are visible
+    if app.config.get('TEMPLATE_WARMUP'):
+        warm_templates(app)
     
     return app
 
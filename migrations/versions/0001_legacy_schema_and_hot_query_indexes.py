@@ -0,0 +1,233 @@
+"""legacy schema baseline and hot-query indexes
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 08:33:46.439945
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# This is the root revision: the read model (0002) mirrors these tables.
+# The production database predates migrations, so every table here is only
+# created when missing: on an existing install this revision just adds the
+# indexes, on a fresh database it builds the schema the routes actually use
+# (which has drifted a long way from models.py).
+#
+# No foreign keys: the legacy data was never constrained and the routes delete
+# parents and children in separate statements.
+
+def _created_at():
+    return sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.now())
+
+
+def _create_tables(inspector):
+    if not inspector.has_table('user_registration_requests'):
+        op.create_table(
+            'user_registration_requests',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('username', sa.String(50), nullable=False, unique=True),
+            sa.Column('password', sa.Text(), nullable=False),
+            sa.Column('email', sa.String(100), nullable=False, unique=True),
+            sa.Column('name', sa.String(250)),
+            sa.Column('phone', sa.String(250)),
+            sa.Column('processed', sa.Boolean(), nullable=False, server_default=sa.false()),
+            _created_at(),
+        )
+
+    if not inspector.has_table('users'):
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('username', sa.String(255), nullable=False, unique=True),
+            sa.Column('email', sa.String(100), nullable=False, unique=True),
+            sa.Column('password', sa.String(255), nullable=False),
+            sa.Column('name', sa.String(250)),
+            sa.Column('phone', sa.String(250)),
+            sa.Column('address', sa.Text()),
+            sa.Column('profile_image', sa.Text()),
+            sa.Column('role', sa.String(20), nullable=False, server_default='user'),
+            sa.Column('is_active', sa.Boolean(), nullable=False, server_default=sa.true()),
+            sa.Column('is_verified', sa.Boolean(), nullable=False, server_default=sa.false()),
+            sa.Column('verification_token', sa.String(255)),
+            sa.Column('token_expires_at', sa.DateTime()),
+            # Legacy columns still present on older installs
+            sa.Column('is_admin', sa.Boolean(), server_default=sa.false()),
+            sa.Column('is_approved', sa.Boolean(), server_default=sa.false()),
+            sa.Column('suspended', sa.Boolean(), server_default=sa.false()),
+            sa.Column('activation_token', sa.Text()),
+            sa.Column('is_activated', sa.Boolean(), server_default=sa.false()),
+            sa.Column('registration_request_id', sa.Integer()),
+            _created_at(),
+            sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now()),
+        )
+
+    if not inspector.has_table('business_registration_requests'):
+        op.create_table(
+            'business_registration_requests',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer()),
+            sa.Column('business_name', sa.String(100), nullable=False),
+            sa.Column('shop_no', sa.String(100), nullable=False),
+            sa.Column('block_num', sa.String(50)),
+            sa.Column('phone_number', sa.String(20)),
+            sa.Column('email', sa.String(100)),
+            sa.Column('category', sa.String(50), nullable=False),
+            sa.Column('description', sa.Text(), nullable=False),
+            sa.Column('website_url', sa.String(255)),
+            sa.Column('social_handles', sa.Text()),
+            sa.Column('processed', sa.Boolean(), nullable=False, server_default=sa.false()),
+            _created_at(),
+        )
+
+    if not inspector.has_table('businesses'):
+        op.create_table(
+            'businesses',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('owner_id', sa.Integer()),
+            sa.Column('business_name', sa.String(100), nullable=False),
+            sa.Column('slug', sa.String(255)),
+            sa.Column('description', sa.Text()),
+            sa.Column('shop_no', sa.String(100)),
+            sa.Column('block_num', sa.String(50)),
+            sa.Column('address', sa.Text()),
+            sa.Column('phone_number', sa.String(20)),
+            sa.Column('email', sa.String(100)),
+            sa.Column('category', sa.String(50)),
+            sa.Column('custom_categories', sa.Text()),
+            sa.Column('website_url', sa.String(255)),
+            sa.Column('facebook_link', sa.String(255)),
+            sa.Column('instagram_link', sa.String(255)),
+            sa.Column('twitter_link', sa.String(255)),
+            sa.Column('media_type', sa.String(10)),
+            sa.Column('media_url', sa.Text()),
+            sa.Column('media_type_2', sa.String(10)),
+            sa.Column('media_url_2', sa.Text()),
+            sa.Column('is_subscribed', sa.Boolean(), nullable=False, server_default=sa.false()),
+            sa.Column('is_verified', sa.Boolean(), nullable=False, server_default=sa.false()),
+            sa.Column('status', sa.String(20), nullable=False, server_default='pending'),
+            _created_at(),
+        )
+
+    if not inspector.has_table('categories'):
+        op.create_table(
+            'categories',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('category_name', sa.String(255), nullable=False, unique=True),
+            sa.Column('slug', sa.String(255)),
+        )
+
+    if not inspector.has_table('business_categories'):
+        op.create_table(
+            'business_categories',
+            sa.Column('business_id', sa.Integer(), primary_key=True),
+            sa.Column('category_id', sa.Integer(), primary_key=True),
+        )
+
+    if not inspector.has_table('subscription_plans'):
+        op.create_table(
+            'subscription_plans',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('plan_name', sa.String(50), nullable=False),
+            sa.Column('amount', sa.DECIMAL(10, 2), nullable=False),
+            sa.Column('duration', sa.Integer(), nullable=False),
+        )
+
+    if not inspector.has_table('subscriptions'):
+        op.create_table(
+            'subscriptions',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('business_id', sa.Integer()),
+            sa.Column('plan_id', sa.Integer()),
+            sa.Column('status', sa.String(20), server_default='pending'),
+            sa.Column('subscription_date', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        )
+
+    if not inspector.has_table('payments'):
+        op.create_table(
+            'payments',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('subscription_id', sa.Integer()),
+            sa.Column('amount', sa.DECIMAL(10, 2), nullable=False),
+            sa.Column('payment_status', sa.String(20), server_default='pending'),
+            sa.Column('payment_method', sa.String(50)),
+            sa.Column('payment_date', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        )
+
+    if not inspector.has_table('claim_requests'):
+        op.create_table(
+            'claim_requests',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('business_id', sa.Integer()),
+            sa.Column('user_id', sa.Integer()),
+            sa.Column('phone_number', sa.String(255)),
+            sa.Column('email', sa.String(255)),
+            sa.Column('category', sa.String(255)),
+            sa.Column('description', sa.Text()),
+            sa.Column('reviewed', sa.Boolean(), nullable=False, server_default=sa.false()),
+            _created_at(),
+        )
+
+    if not inspector.has_table('admin_activities'):
+        op.create_table(
+            'admin_activities',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('admin_id', sa.Integer()),
+            sa.Column('action', sa.String(50), nullable=False),
+            sa.Column('details', sa.Text()),
+            _created_at(),
+        )
+
+
+# name -> (table, column list). Raw column lists so DESC keys survive.
+INDEXES = {
+    # Public profile lookup (WHERE b.slug = %s) and generate_unique_slug
+    'ix_businesses_slug': ('businesses', 'slug'),
+    # Owner dashboards, user lists (COUNT per owner), reassignment checks
+    'ix_businesses_owner_id': ('businesses', 'owner_id, status'),
+    # Category membership both ways: listing refresh (by business) and
+    # "related businesses" on the profile page (by category)
+    'ix_business_categories_business_category': ('business_categories', 'business_id, category_id'),
+    'ix_business_categories_category_business': ('business_categories', 'category_id, business_id'),
+    # Category page (WHERE slug = %s)
+    'ix_categories_slug': ('categories', 'slug'),
+    # Admin user lists (ORDER BY created_at DESC, WHERE role = 'owner')
+    'ix_users_created_at': ('users', 'created_at DESC'),
+    'ix_users_role': ('users', 'role, username'),
+    'ix_subscriptions_business_id': ('subscriptions', 'business_id'),
+    'ix_claim_requests_reviewed': ('claim_requests', 'reviewed, created_at'),
+    'ix_admin_activities_created_at': ('admin_activities', 'created_at DESC'),
+}
+
+
+def _existing_indexes(inspector, table):
+    names = {ix['name'] for ix in inspector.get_indexes(table)}
+    pk = inspector.get_pk_constraint(table)
+    if pk and pk.get('name'):
+        names.add(pk['name'])
+    return names
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    _create_tables(inspector)
+
+    inspector = sa.inspect(op.get_bind())
+    for name, (table, columns) in INDEXES.items():
+        if name not in _existing_indexes(inspector, table):
+            op.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+
+
+def downgrade():
+    # Only the indexes: the tables hold the production data this revision
+    # adopted rather than created.
+    for name, (table, _columns) in INDEXES.items():
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,78 @@
+"""business listing read model and full-text search
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 08:40:12.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('business_listing'):
+        op.execute("""
+            CREATE TABLE business_listing (
+                id INT NOT NULL PRIMARY KEY,
+                owner_id INT NULL,
+                owner_username VARCHAR(255) NULL,
+                business_name VARCHAR(255) NOT NULL,
+                slug VARCHAR(255) NULL,
+                description TEXT NULL,
+                shop_no VARCHAR(100) NULL,
+                block_num VARCHAR(50) NULL,
+                phone_number VARCHAR(20) NULL,
+                email VARCHAR(100) NULL,
+                website_url VARCHAR(255) NULL,
+                facebook_link VARCHAR(255) NULL,
+                instagram_link VARCHAR(255) NULL,
+                media_type VARCHAR(10) NULL,
+                media_url TEXT NULL,
+                is_subscribed TINYINT(1) NOT NULL DEFAULT 0,
+                status VARCHAR(20) NOT NULL,
+                status_rank TINYINT NOT NULL,
+                created_at DATETIME NULL,
+                categories TEXT NULL,
+                primary_category VARCHAR(255) NULL,
+                category_count INT NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                KEY ix_business_listing_feed (is_subscribed DESC, status_rank, created_at DESC, id DESC),
+                KEY ix_business_listing_owner (owner_id)
+            )
+        """)
+
+    if not inspector.has_table('business_listing_category'):
+        op.execute("""
+            CREATE TABLE business_listing_category (
+                category_id INT NOT NULL,
+                business_id INT NOT NULL,
+                is_subscribed TINYINT(1) NOT NULL DEFAULT 0,
+                status VARCHAR(20) NOT NULL,
+                created_at DATETIME NULL,
+                PRIMARY KEY (category_id, business_id),
+                KEY ix_business_listing_category_feed (category_id, is_subscribed DESC, created_at DESC, business_id DESC),
+                KEY ix_business_listing_category_business (business_id)
+            )
+        """)
+
+    # Backs MATCH() in business.search_business
+    if 'ft_business_listing_search' not in {ix['name'] for ix in inspector.get_indexes('business_listing')}:
+        op.execute("""
+            ALTER TABLE business_listing
+            ADD FULLTEXT INDEX ft_business_listing_search (business_name, description, shop_no, categories)
+        """)
+
+
+def downgrade():
+    op.drop_index('ft_business_listing_search', table_name='business_listing')
+    op.drop_table('business_listing_category')
+    op.drop_table('business_listing')
@@ -0,0 +1,51 @@
+"""admin dashboard counters
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 08:52:37.604113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'stat_counters',
+        sa.Column('name', sa.String(64), primary_key=True),
+        sa.Column('value', sa.BigInteger(), nullable=False, server_default='0'),
+    )
+    op.create_table(
+        'user_business_counts',
+        sa.Column('user_id', sa.Integer(), primary_key=True),
+        sa.Column('business_count', sa.Integer(), nullable=False, server_default='0'),
+    )
+
+    # Seed from the source tables; same queries as `flask counters reconcile`
+    op.execute("""
+        INSERT INTO stat_counters (name, value)
+        SELECT 'total_users', COUNT(*) FROM users
+        UNION ALL SELECT 'total_businesses', COUNT(*) FROM businesses
+        UNION ALL SELECT 'active_businesses', COUNT(*) FROM businesses WHERE status = 'active'
+        UNION ALL SELECT 'pending_businesses', COUNT(*) FROM businesses WHERE status = 'pending'
+        UNION ALL SELECT 'suspended_businesses', COUNT(*) FROM businesses WHERE status = 'suspended'
+        UNION ALL SELECT 'subscribed_businesses', COUNT(*) FROM businesses WHERE is_subscribed = TRUE
+    """)
+    op.execute("""
+        INSERT INTO user_business_counts (user_id, business_count)
+        SELECT owner_id, COUNT(*) FROM businesses
+        WHERE owner_id IS NOT NULL
+        GROUP BY owner_id
+    """)
+
+
+def downgrade():
+    op.drop_table('user_business_counts')
+    op.drop_table('stat_counters')
@@ -0,0 +1,25 @@
+"""business listing version
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 09:04:51.370228
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Bumped by every services.listing.refresh_listing; keys the cached card fragment
+    op.add_column('business_listing', sa.Column('version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    op.drop_column('business_listing', 'version')
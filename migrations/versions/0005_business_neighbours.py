@@ -0,0 +1,34 @@
+"""business neighbours
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 09:17:26.845310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+# Populate with `flask recommend rebuild` after upgrading.
+
+def upgrade():
+    op.create_table(
+        'business_neighbours',
+        sa.Column('business_id', sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column('position', sa.SmallInteger(), primary_key=True, autoincrement=False),
+        sa.Column('neighbour_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+    )
+    # refresh_neighbours looks up who lists a changed business
+    op.create_index('ix_business_neighbours_neighbour_id', 'business_neighbours', ['neighbour_id'])
+
+
+def downgrade():
+    op.drop_table('business_neighbours')
@@ -0,0 +1,34 @@
+"""business slug redirects
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 09:31:02.517944
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Old slug -> renamed business, served as 301s by public_business_profile
+    op.create_table(
+        'business_slug_redirects',
+        sa.Column('old_slug', sa.String(255), primary_key=True),
+        sa.Column('business_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index('ix_business_slug_redirects_business_id', 'business_slug_redirects', ['business_id'])
+    # services.slugs resolves slugs against the read model
+    op.create_index('ix_business_listing_slug', 'business_listing', ['slug'])
+
+
+def downgrade():
+    op.drop_index('ix_business_listing_slug', table_name='business_listing')
+    op.drop_table('business_slug_redirects')
@@ -0,0 +1,48 @@
+"""unique business slug
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 09:44:18.093561
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Empty slugs would collide with each other; NULLs don't
+    op.execute("UPDATE businesses SET slug = NULL WHERE slug = ''")
+
+    # Keep the oldest holder of a duplicated slug, suffix the rest with their id
+    op.execute("""
+        UPDATE businesses b
+        JOIN (
+            SELECT slug, MIN(id) AS keep_id
+            FROM businesses
+            WHERE slug IS NOT NULL
+            GROUP BY slug
+            HAVING COUNT(*) > 1
+        ) dup ON dup.slug = b.slug AND b.id <> dup.keep_id
+        SET b.slug = CONCAT(b.slug, '-', b.id)
+    """)
+    op.execute("""
+        UPDATE business_listing bl
+        JOIN businesses b ON b.id = bl.id
+        SET bl.slug = b.slug, bl.version = bl.version + 1
+        WHERE NOT (bl.slug <=> b.slug)
+    """)
+
+    op.drop_index('ix_businesses_slug', table_name='businesses')
+    op.create_index('ux_businesses_slug', 'businesses', ['slug'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ux_businesses_slug', table_name='businesses')
+    op.create_index('ix_businesses_slug', 'businesses', ['slug'])
@@ -0,0 +1,25 @@
+"""business listing updated_at index
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 11:12:40.208317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # services.export: WHERE updated_at >= since ORDER BY updated_at, id
+    op.create_index('ix_business_listing_updated', 'business_listing', ['updated_at', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_business_listing_updated', table_name='business_listing')
@@ -0,0 +1,44 @@
+"""email outbox
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 12:03:27.664810
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Mails queued by the auth routes, delivered by `flask outbox work`
+    op.create_table(
+        'email_outbox',
+        sa.Column('id', sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column('kind', sa.String(32), nullable=False),
+        sa.Column('recipient', sa.String(255), nullable=False),
+        sa.Column('sender', sa.String(255), nullable=False),
+        sa.Column('subject', sa.String(255), nullable=False),
+        sa.Column('html_body', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(10), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column('locked_by', sa.String(64), nullable=True),
+        sa.Column('locked_until', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+    )
+    # The worker's claim: WHERE status = 'pending' AND next_attempt_at <= NOW() ORDER BY id
+    op.create_index('ix_email_outbox_due', 'email_outbox', ['status', 'next_attempt_at', 'id'])
+    op.create_index('ix_email_outbox_locked_by', 'email_outbox', ['locked_by'])
+
+
+def downgrade():
+    op.drop_table('email_outbox')
@@ -0,0 +1,30 @@
+"""media variants
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 13:20:51.904716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Resized JPEG/WebP copies of image uploads (utils.images), one per media slot
+    op.add_column('businesses', sa.Column('media_variants', sa.JSON(), nullable=True))
+    op.add_column('businesses', sa.Column('media_variants_2', sa.JSON(), nullable=True))
+    # Cards read the primary media from the read model
+    op.add_column('business_listing', sa.Column('media_variants', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('business_listing', 'media_variants')
+    op.drop_column('businesses', 'media_variants_2')
+    op.drop_column('businesses', 'media_variants')
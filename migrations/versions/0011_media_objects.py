@@ -0,0 +1,35 @@
+"""media objects
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18 14:37:09.118350
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # One row per content-addressed upload (utils.media_store) with the number
+    # of rows referencing it; `flask media gc` removes files left at zero
+    op.create_table(
+        'media_objects',
+        sa.Column('digest', sa.CHAR(64), primary_key=True),
+        sa.Column('path', sa.String(255), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=True),
+        sa.Column('refcount', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column('released_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_media_objects_released', 'media_objects', ['refcount', 'released_at'])
+
+
+def downgrade():
+    op.drop_table('media_objects')
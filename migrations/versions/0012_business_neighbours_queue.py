@@ -0,0 +1,33 @@
+"""business neighbours queue
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-18 16:02:41.530118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0012'
+down_revision = '0011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Businesses whose similar-business lists are stale; drained by
+    # `flask recommend work`. requests counts re-queues so the worker only
+    # removes rows nobody touched while it was computing
+    op.create_table(
+        'business_neighbours_queue',
+        sa.Column('business_id', sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column('requests', sa.Integer(), nullable=False, server_default='1'),
+        sa.Column('queued_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index('ix_business_neighbours_queue_queued_at', 'business_neighbours_queue', ['queued_at'])
+
+
+def downgrade():
+    op.drop_table('business_neighbours_queue')
@@ -0,0 +1,30 @@
+"""listing created_at not null
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-18 16:40:12.274903
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0013'
+down_revision = '0012'
+branch_labels = None
+depends_on = None
+
+
+# created_at is part of the feed order and the keyset cursor; NULLs broke
+# the cursor and fell out of the AFTER/BEFORE predicates. services.listing
+# now writes COALESCE(b.created_at, '1970-01-01 00:00:00').
+
+def upgrade():
+    for table in ('business_listing', 'business_listing_category'):
+        op.execute(f"UPDATE {table} SET created_at = '1970-01-01 00:00:00' WHERE created_at IS NULL")
+        op.execute(f"ALTER TABLE {table} MODIFY created_at DATETIME NOT NULL")
+
+
+def downgrade():
+    for table in ('business_listing', 'business_listing_category'):
+        op.execute(f"ALTER TABLE {table} MODIFY created_at DATETIME NULL")
@@ -1,5 +1,12 @@
 from flask import Blueprint, request, render_template, redirect, session, url_for, flash
-from utils.helpers import get_db_connection, admin_required
+from services.counters import dashboard_stats
+from services.listing import refresh_listing, refresh_owner_listings
+from services.slugs import rename_business_slug
+from utils.helpers import get_db_connection, admin_required, upload_file
+from utils.images import image_variants
+from utils.media_store import release_business_media, swap_media
+from utils.uploads import upload_media_type
+from utils.videos import video_metadata
 
 # bp = Blueprint('user', __name__)
 bp = Blueprint('admin', __name__, url_prefix='/admin')
@@ -12,17 +19,8 @@ def dashboard():
     try:
         cur = conn.cursor(dictionary=True)
         
-        # Get system statistics
-        cur.execute("""
-            SELECT 
-                (SELECT COUNT(*) FROM users) as total_users,
-                (SELECT COUNT(*) FROM businesses) as total_businesses,
-                (SELECT COUNT(*) FROM businesses WHERE status = 'active') as active_businesses,
-                (SELECT COUNT(*) FROM businesses WHERE status = 'pending') as pending_businesses,
-                (SELECT COUNT(*) FROM businesses WHERE status = 'suspended') as suspended_businesses,
-                (SELECT COUNT(*) FROM businesses WHERE is_subscribed = TRUE) as subscribed_businesses
-        """)
-        stats = cur.fetchone()
+        # Get system statistics (maintained counters; see services.counters)
+        stats = dashboard_stats(cur)
         
         # Get recent activities
         cur.execute("""
@@ -53,13 +51,12 @@ def manage_users():
         cur = conn.cursor(dictionary=True)
         cur.execute("""
             SELECT u.*, 
-                   COUNT(b.id) as business_count,
+                   COALESCE(ubc.business_count, 0) as business_count,
                    CASE WHEN u.role = 'admin' THEN 'Admin'
                         WHEN u.role = 'owner' THEN 'Business Owner'
                         ELSE 'Regular User' END as role_display
             FROM users u
-            LEFT JOIN businesses b ON u.id = b.owner_id
-            GROUP BY u.id
+            LEFT JOIN user_business_counts ubc ON ubc.user_id = u.id
             ORDER BY u.created_at DESC
         """)
         users = cur.fetchall()
@@ -93,6 +90,7 @@ def edit_user(user_id):
                 RETURNING *
             """, (username, email, role, is_active, user_id))
             updated_user = cur.fetchone()
+            refresh_owner_listings(cur, user_id)
             conn.commit()
             
             # Log admin activity
@@ -188,6 +186,8 @@ def edit_business(business_id):
                 RETURNING *
             """, (business_name, description, status, is_verified, is_subscribed, business_id))
             updated_business = cur.fetchone()
+            rename_business_slug(cur, business_id, business_name)
+            refresh_listing(cur, business_id)
             conn.commit()
             
             # Log admin activity
@@ -256,6 +256,7 @@ def assign_business(business_id):
                 WHERE id = %s
                 RETURNING *
             """, (new_owner_id, business_id))
+            refresh_listing(cur, business_id)
             conn.commit()
             
             # Log admin activity
@@ -359,6 +360,7 @@ def suspend_business(business_id):
             SET status = 'suspended'
             WHERE id = %s
         """, (business_id,))
+        refresh_listing(cur, business_id)
         conn.commit()
         
         # Log admin activity
@@ -400,6 +402,7 @@ def activate_business(business_id):
             SET status = 'active'
             WHERE id = %s
         """, (business_id,))
+        refresh_listing(cur, business_id)
         conn.commit()
         
         # Log admin activity
@@ -437,9 +440,11 @@ def delete_business(business_id):
         
         # Delete business categories first
         cur.execute("DELETE FROM business_categories WHERE business_id = %s", (business_id,))
+        release_business_media(cur, business_id)
         
         # Then delete the business
         cur.execute("DELETE FROM businesses WHERE id = %s", (business_id,))
+        refresh_listing(cur, business_id)
         conn.commit()
         
         # Log admin activity
@@ -482,11 +487,17 @@ def update_business_media(business_id):
         if file and file.filename:
             file_path = upload_file(file)
             if file_path:
+                cur.execute("SELECT media_url FROM businesses WHERE id = %s", (business_id,))
+                current = cur.fetchone()
+                media_type = upload_media_type(file)
+                media_variants = image_variants(file_path) if media_type == 'image' else video_metadata(file_path)
                 cur.execute("""
                     UPDATE businesses 
-                    SET media_url = %s, media_type = 'image'
+                    SET media_url = %s, media_type = %s, media_variants = %s
                     WHERE id = %s
-                """, (file_path, business_id))
+                """, (file_path, media_type, media_variants, business_id))
+                swap_media(cur, current['media_url'] if current else None, file_path)
+                refresh_listing(cur, business_id)
                 conn.commit()
                 flash('Business media updated successfully!', 'success')
         
@@ -1,8 +1,10 @@
 import traceback
 from flask import (current_app as app, Blueprint, request, render_template, redirect, url_for, flash, session)
 from werkzeug.security import generate_password_hash, check_password_hash
+from services.counters import user_created
 from utils.helpers import (generate_token, verify_token, get_db_connection, verify_reset_token)
-from utils.emails import (send_verification_email, send_reset_email)
+from services.outbox import enqueue_email
+from utils.emails import (verification_message, reset_message)
 
 from markupsafe import Markup
 import re
@@ -106,14 +108,11 @@ def resend_verification(username):
             elif user['is_verified']:
                 flash("Account is already verified.", 'info')
             else:
-                # Generate new token and send email
+                # Generate new token and queue the email (services.outbox sends it)
                 token = generate_token(user['email'])
-                # send_verification_email(app, user.email, token)
-                sent = send_verification_email(app, user['email'], token)
-                if sent:
-                    flash(f"Verification email resent to {user['email']} sent: {sent}. Please check your inbox.", 'success')
-                else:
-                    flash(f"Could not send Verification mail to {user['email']}. sent: {sent}", 'warning')
+                enqueue_email(cur, 'verification', verification_message(app, user['email'], token))
+                conn.commit()
+                flash(f"Verification email resent to {user['email']}. Please check your inbox.", 'success')
                 
     except Exception as e:
         app.logger.error(f"Resend verification error: {str(e)}")
@@ -287,12 +286,11 @@ def register():
                     'user'  # Default role
                 ))
                 user_id = cur.lastrowid
+                user_created(cur)
+                # Queued in the same transaction; services.outbox sends it
+                enqueue_email(cur, 'verification', verification_message(app, email, verification_token))
                 conn.commit()
 
-                # Send verification email
-                send_verification_email(app, email, verification_token)
-                
-                
                 flash('Registration successful! Please check your email to verify your account.', 'success')
                 return redirect(url_for('auth.login'))
 
@@ -384,16 +382,16 @@ def forgot_password():
         email = request.form['email']
         conn = get_db_connection()
         cur = conn.cursor(dictionary=True)
-        cur.execute('SELECT id FROM users WHERE email = %s', (email,))
+        cur.execute('SELECT id, email FROM users WHERE email = %s', (email,))
         user = cur.fetchone()
+        if user:
+            token = generate_token(user['email'])
+            enqueue_email(cur, 'reset', reset_message(app, email, token))
+            conn.commit()
         cur.close()
         conn.close()
 
         if user:
-            token = generate_token(user['email'])
-            # print(f"Generated token: {token}")  # Debugging line
-            # send_reset_email(email, token)  # Ensure this function is defined correctly
-            send_reset_email(app, email, token)
             flash('An email with a password reset link has been sent to your email address.', 'info')
             return redirect(url_for('auth.login'))
         else:
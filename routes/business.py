@@ -1,12 +1,19 @@
 from random import randint
 import traceback
 import os
+import re
 from flask import Blueprint, current_app as app, request, render_template, redirect, session, url_for, flash
 import mysql
+from services.listing import invalidate_reference_data, refresh_listing
 from services.schema import business_schema
-from services.seo import build_seo
+from services.seo import build_seo, cached_seo
+from services.slugs import rename_business_slug, resolve_slug
 from utils.helpers import get_db_connection, upload_file
-from utils.slug import generate_unique_slug, slugify
+from utils.images import image_variants
+from utils.media_store import retain_media, swap_media
+from utils.slug import allocate_slug, slugify
+from utils.uploads import upload_media_type
+from utils.videos import video_metadata
 
 
 bp = Blueprint('business', __name__)
@@ -112,7 +119,10 @@ def review_claim(request_id):
                     VALUES (%s, %s)""", (business_id, category_id))
                 print("Business linked with category")
 
+                refresh_listing(cur, business_id)
                 conn.commit()  # Ensure all changes are committed
+                if category is None:
+                    invalidate_reference_data()
                 flash("Claim request approved and business ownership updated!", 'success')
                 return redirect(url_for('admin.admin_dashboard'))
             else:
@@ -169,6 +179,7 @@ def process_business_registration():
         if category is None:
             cur.execute("INSERT INTO categories (category_name) VALUES (%s)", (category_name,))
             conn.commit()  # Commit to generate the ID
+            invalidate_reference_data()
             cur.execute("SELECT LAST_INSERT_ID()")
             category_id = cur.fetchone()[0]
             print(f"Inserted new category with ID: {category_id}")
@@ -177,10 +188,13 @@ def process_business_registration():
             print(f"Found existing category with ID: {category_id}")
 
         # Insert the new business with the correct owner_id and email
-        cur.execute("""
-            INSERT INTO businesses (owner_id, business_name, shop_no, phone_number, description, block_num, email, category)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        """, (user_id, business_name, shop_no, phone_number, description, block_num, email, category_name))
+        def insert_business(slug):
+            cur.execute("""
+                INSERT INTO businesses (owner_id, business_name, slug, shop_no, phone_number, description, block_num, email, category)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, (user_id, business_name, slug, shop_no, phone_number, description, block_num, email, category_name))
+
+        allocate_slug(cur, slugify(business_name or ""), insert_business)
         conn.commit()  # Commit to generate the ID
         cur.execute("SELECT LAST_INSERT_ID()")
         business_id = cur.fetchone()[0]
@@ -188,6 +202,7 @@ def process_business_registration():
 
         # Link the business with its category
         cur.execute("INSERT INTO business_categories (business_id, category_id) VALUES (%s, %s)", (business_id, category_id))
+        refresh_listing(cur, business_id)
         conn.commit()
         print(f"Linked business ID {business_id} with category ID {category_id}")
 
@@ -239,6 +254,7 @@ def subscribe(business_id):
                     SET is_subscribed = TRUE
                     WHERE id = %s
                 """, (business_id,))
+                refresh_listing(cur, business_id)
                 
                 conn.commit()
                 flash("Subscription successful!", "success")
@@ -397,18 +413,22 @@ def business_profile(business_id):
                     'website_url': website
                 }
 
+                # Resized copies of new image uploads (utils.images) or video metadata
+                # (utils.videos); None clears them
+                media_variant_fields = {}
+
                 # Handle primary media upload
                 if file and file.filename:
                     file_path = upload_file(file)
                     if file_path:
-                        mimetype = getattr(file, 'mimetype', '') or getattr(file, 'content_type', '')
-                        print(f"Uploaded primary file mimetype: {mimetype}")
-                        if mimetype and mimetype.startswith('video/'):
+                        if upload_media_type(file) == 'video':
                             update_fields_raw['media_url'] = file_path
                             update_fields_raw['media_type'] = 'video'
+                            media_variant_fields['media_variants'] = video_metadata(file_path)
                         else:
                             update_fields_raw['media_url'] = file_path
                             update_fields_raw['media_type'] = 'image'
+                            media_variant_fields['media_variants'] = image_variants(file_path)
                         print(f"Primary file uploaded to: {file_path}")
 
                 # Handle secondary media upload with validation
@@ -417,40 +437,32 @@ def business_profile(business_id):
                     current_media_type = business.get('media_type', '')
                     if file and file.filename:
                         # If uploading new primary media, use that type
-                        current_media_type = 'video' if (getattr(file, 'mimetype', '') or '').startswith('video/') else 'image'
+                        current_media_type = upload_media_type(file)
                     
-                    # Determine new secondary media type
-                    mimetype2 = getattr(file2, 'mimetype', '') or getattr(file2, 'content_type', '')
-                    new_media_type_2 = 'video' if mimetype2.startswith('video/') else 'image'
+                    # Determine new secondary media type (sniffed, see utils.uploads)
+                    new_media_type_2 = upload_media_type(file2)
                     
                     # Validation: Don't allow 2 videos
                     if current_media_type == 'video' and new_media_type_2 == 'video':
                         flash('Cannot upload 2 videos. Please upload 1 video + 1 image, or 2 images.', 'error')
                     else:
-                        # Delete old secondary media if exists
-                        if business.get('media_url_2'):
-                            try:
-                                old_file_path = business['media_url_2']
-                                if old_file_path.startswith('/static/'):
-                                    old_file_path = old_file_path[1:]  # Remove leading slash
-                                full_path = os.path.join(app.root_path, old_file_path)
-                                if os.path.exists(full_path):
-                                    os.remove(full_path)
-                                    print(f"Deleted old secondary media: {full_path}")
-                            except Exception as e:
-                                print(f"Error deleting old secondary media: {e}")
-                        
-                        # Upload new secondary media
+                        # Upload new secondary media (the old one is released
+                        # below; uploads are shared, so never delete them here)
                         file_path_2 = upload_file(file2)
                         if file_path_2:
                             update_fields_raw['media_url_2'] = file_path_2
                             update_fields_raw['media_type_2'] = new_media_type_2
+                            media_variant_fields['media_variants_2'] = (
+                                image_variants(file_path_2) if new_media_type_2 == 'image'
+                                else video_metadata(file_path_2)
+                            )
                             print(f"Secondary file uploaded to: {file_path_2}")
 
                 selected_category_ids = request.form.getlist('categories')
                     
                 # Remove keys with None or empty strings
                 update_fields = {k: v for k, v in update_fields_raw.items() if v is not None and v != ''}
+                update_fields.update(media_variant_fields)
 
                 # Only execute update when there are fields to change
                 if update_fields:
@@ -465,6 +477,11 @@ def business_profile(business_id):
                         values.append(business_id)
 
                     cur.execute(update_sql, values)
+                    for url_column in ('media_url', 'media_url_2'):
+                        if url_column in update_fields:
+                            swap_media(cur, business.get(url_column), update_fields[url_column])
+                    if 'business_name' in update_fields and business_name != business.get('business_name'):
+                        rename_business_slug(cur, business_id, business_name)
 
                 # Update business categories
                 cur.execute("DELETE FROM business_categories WHERE business_id = %s", (business_id,))
@@ -475,6 +492,7 @@ def business_profile(business_id):
                             VALUES (%s, %s)
                         """, (business_id, cat_id))
 
+                refresh_listing(cur, business_id)
                 conn.commit()
                 flash('Business updated successfully!', 'success')
                 return redirect(url_for('user.business_profile', business_id=business_id))
@@ -570,20 +588,22 @@ def public_business_profile(business_slug):
         conn = get_db_connection()
         cur = conn.cursor(dictionary=True)
 
-        cur.execute("""
-            SELECT
-                b.*,
-                u.username AS owner_username,
-                GROUP_CONCAT(DISTINCT c.category_name) AS categories
-            FROM businesses b
-            LEFT JOIN users u ON b.owner_id = u.id
-            LEFT JOIN business_categories bc ON b.id = bc.business_id
-            LEFT JOIN categories c ON bc.category_id = c.id
-            WHERE b.slug = %s
-              AND b.status = 'active'
-            GROUP BY b.id
-        """, (business_slug,))
-        business = cur.fetchone()
+        target = resolve_slug(cur, business_slug)
+        if target and target.redirect_to:
+            # Renamed business: send old links to the current slug
+            return redirect(url_for("business.public_business_profile", business_slug=target.redirect_to), 301)
+
+        business = None
+        if target and target.status == 'active':
+            # Primary-key lookups; owner and category names come from the read model
+            cur.execute("""
+                SELECT b.*, bl.owner_username, bl.categories, bl.version AS listing_version
+                FROM businesses b
+                JOIN business_listing bl ON bl.id = b.id
+                WHERE b.id = %s
+                  AND b.status = 'active'
+            """, (target.business_id,))
+            business = cur.fetchone()
 
         if not business:
             flash(
@@ -592,32 +612,28 @@ def public_business_profile(business_slug):
             )
             return redirect(url_for("index.home"))
 
-        # Similar businesses
+        # Similar businesses (precomputed; see services.recommend)
         cur.execute("""
             SELECT
-                b.business_name,
-                b.slug,
-                b.media_url,
-                b.media_type
-            FROM businesses b
-            JOIN business_categories bc ON b.id = bc.business_id
-            WHERE bc.category_id IN (
-                SELECT category_id
-                FROM business_categories
-                WHERE business_id = %s
-            )
-              AND b.id != %s
-              AND b.status = 'active'
-            GROUP BY b.id
+                bl.business_name,
+                bl.slug,
+                bl.media_url,
+                bl.media_type,
+                bl.media_variants
+            FROM business_neighbours bn
+            JOIN business_listing bl ON bl.id = bn.neighbour_id
+            WHERE bn.business_id = %s
+              AND bl.status = 'active'
+            ORDER BY bn.position
             LIMIT 4
-        """, (business["id"], business["id"]))
+        """, (business["id"],))
         
-        seo = build_seo(
-        title=f'{business["business_name"]} in Ajah, Lagos',
-        description=f'{business["business_name"]} is a trusted {business["categories"]} business in Ajah, Lagos.',
-        image=business.get("media_url"),
-        schema=business_schema(business),
-    )
+        seo = cached_seo(('business', business["id"], business["listing_version"]), lambda: build_seo(
+            title=f'{business["business_name"]} in Ajah, Lagos',
+            description=f'{business["business_name"]} is a trusted {business["categories"]} business in Ajah, Lagos.',
+            image=business.get("media_url"),
+            schema=business_schema(business),
+        ))
 
         similar_businesses = cur.fetchall()
 
@@ -638,6 +654,10 @@ def public_business_profile(business_slug):
             conn.close()
 
 
+# Columns of the ft_business_listing_search FULLTEXT index (migration 0002)
+SEARCH_COLUMNS = "bl.business_name, bl.description, bl.shop_no, bl.categories"
+
+
 @bp.route('/search-business')
 def search_business():
     """Search businesses by name, category, or shop number"""
@@ -658,78 +678,78 @@ def search_business():
         per_page = 12
         offset = (page - 1) * per_page
         
-        # Base query with joins
-        base_query = """
-            SELECT 
-                b.*,
-                u.username as owner_username,
-                GROUP_CONCAT(DISTINCT c.category_name SEPARATOR ', ') AS categories,
-                COUNT(DISTINCT c.id) as category_count,
-                MIN(c.category_name) as primary_category,
-                CASE 
-                    WHEN b.status = 'active' THEN 0 
-                    WHEN b.status = 'pending' THEN 1
-                    ELSE 2 
-                END as status_order
-            FROM businesses b
-            LEFT JOIN users u ON b.owner_id = u.id
-            LEFT JOIN business_categories bc ON b.id = bc.business_id
-            LEFT JOIN categories c ON bc.category_id = c.id
-            WHERE b.status != 'deleted'
-        """
-        
-        # Count query (simpler version without all the fields)
-        count_query = """
-            SELECT COUNT(DISTINCT b.id) as total
-            FROM businesses b
-            LEFT JOIN business_categories bc ON b.id = bc.business_id
-            LEFT JOIN categories c ON bc.category_id = c.id
-            WHERE b.status != 'deleted'
-        """
-        
-        # Add search conditions
+        # Flat read-model rows; see services.listing
         conditions = []
         params = []
+        relevance = "0"
+        relevance_params = []
         
         if search_query:
-            condition = """
-                (b.business_name LIKE %s OR 
-                b.description LIKE %s OR 
-                b.shop_no LIKE %s OR 
-                c.category_name LIKE %s)
+            # Words long enough for the FULLTEXT index go through MATCH(); the
+            # index skips shorter ones (e.g. a shop number like "B2"), so those
+            # are matched with LIKE, each one required alongside the MATCH.
+            # Queries made only of short words keep the plain LIKE search.
+            min_len = app.config.get('SEARCH_FULLTEXT_MIN_LENGTH', 3)
+            terms = re.findall(r'\w+', search_query)
+            words = [w for w in terms if len(w) >= min_len]
+            like_condition = """
+                (bl.business_name LIKE %s OR 
+                bl.description LIKE %s OR 
+                bl.shop_no LIKE %s OR 
+                bl.categories LIKE %s)
             """
-            conditions.append(condition)
-            search_term = f"%{search_query}%"
-            params.extend([search_term, search_term, search_term, search_term])
+            if words:
+                conditions.append(f"MATCH({SEARCH_COLUMNS}) AGAINST (%s IN BOOLEAN MODE)")
+                params.append(' '.join(f'+{w}*' for w in words))
+                relevance = f"MATCH({SEARCH_COLUMNS}) AGAINST (%s IN NATURAL LANGUAGE MODE)"
+                relevance_params.append(' '.join(words))
+                for term in dict.fromkeys(w.lower() for w in terms if len(w) < min_len):
+                    conditions.append(like_condition)
+                    params.extend([f"%{term}%"] * 4)
+            else:
+                conditions.append(like_condition)
+                search_term = f"%{search_query}%"
+                params.extend([search_term, search_term, search_term, search_term])
         
         if category_filter:
-            conditions.append("c.id = %s")
+            conditions.append("bl.id IN (SELECT business_id FROM business_listing_category WHERE category_id = %s)")
             params.append(category_filter)
         
+        base_query = f"""
+            SELECT 
+                bl.*,
+                CASE 
+                    WHEN bl.status = 'active' THEN 0 
+                    WHEN bl.status = 'pending' THEN 1
+                    ELSE 2 
+                END as status_order,
+                {relevance} AS relevance,
+                COUNT(*) OVER () AS total_count
+            FROM business_listing bl
+            WHERE bl.status != 'deleted'
+        """
+        params = relevance_params + params
+        
         if conditions:
             where_clause = " AND " + " AND ".join(conditions)
             base_query += where_clause
-            count_query += where_clause
         
-        # Add grouping and ordering to main query
+        # Premium/status ordering first, then relevance within each band
         base_query += """
-            GROUP BY b.id
-            ORDER BY b.is_subscribed DESC, 
+            ORDER BY bl.is_subscribed DESC, 
                      status_order,
-                     b.created_at DESC
+                     relevance DESC,
+                     bl.created_at DESC
             LIMIT %s OFFSET %s
         """
         
-        # Execute count query
-        cur.execute(count_query, params)
-        total = cur.fetchone()['total']
-        
         # Add pagination params
         params.extend([per_page, offset])
         
-        # Execute main query
+        # Execute main query; the window count carries the pre-LIMIT total
         cur.execute(base_query, params)
         businesses = cur.fetchall()
+        total = businesses[0]['total_count'] if businesses else 0
         
         # Process the businesses data
         for biz in businesses:
@@ -803,17 +823,21 @@ def add_business():
 
 
             cur = conn.cursor()
-            
-            slug = generate_unique_slug(cur, base_slug)
 
 
 
             # Handle media upload
             media_url = None
             media_type = None
+            media_variants = None
             if file and file.filename:
                 media_url = upload_file(file)
-                media_type = 'image'  # Default to image type
+                if upload_media_type(file) == 'video':
+                    media_type = 'video'
+                    media_variants = video_metadata(media_url)
+                else:
+                    media_type = 'image'  # Default to image type
+                    media_variants = image_variants(media_url)
 
             # Insert new business with 'pending' status
             # cur = conn.cursor()
@@ -831,22 +855,28 @@ def add_business():
             #     media_type, media_url
             # ))
             
-            cur.execute("""
-                INSERT INTO businesses (
-                    owner_id, business_name, slug, description,
+            def insert_business(slug):
+                cur.execute("""
+                    INSERT INTO businesses (
+                        owner_id, business_name, slug, description,
+                        phone_number, email, shop_no, block_num, address,
+                        website_url, facebook_link, instagram_link, twitter_link,
+                        custom_categories, media_type, media_url, media_variants, status
+                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 'pending')
+                """, (
+                    user_id, business_name, slug, description,
                     phone_number, email, shop_no, block_num, address,
                     website_url, facebook_link, instagram_link, twitter_link,
-                    custom_categories, media_type, media_url, status
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 'pending')
-            """, (
-                user_id, business_name, slug, description,
-                phone_number, email, shop_no, block_num, address,
-                website_url, facebook_link, instagram_link, twitter_link,
-                custom_categories, media_type, media_url
-            ))
-
-            # Get the newly created business ID
+                    custom_categories, media_type, media_url, media_variants
+                ))
+
+            # Retries with the next suffix if a concurrent submission takes the slug
+            allocate_slug(cur, base_slug, insert_business)
+
+            # Get the newly created business ID (before any other statement
+            # resets lastrowid)
             business_id = cur.lastrowid
+            retain_media(cur, media_url)
 
             # Create category relationships
             for category_id in category_ids:
@@ -855,6 +885,7 @@ def add_business():
                     VALUES (%s, %s)
                 """, (business_id, category_id))
             
+            refresh_listing(cur, business_id)
             conn.commit()
             flash('Business submitted for approval!', 'success')
             return redirect(url_for('user.profile'))
@@ -1,8 +1,9 @@
 from flask import Blueprint, current_app, render_template
 import traceback
 from flask import Blueprint, current_app as app, render_template, redirect, session, url_for, flash
+from services.listing import listing_count
 from services.schema import category_schema
-from services.seo import build_seo
+from services.seo import build_seo, cached_seo
 from utils.helpers import get_db_connection
 
 
@@ -132,36 +133,17 @@ def businesses_by_category(category_slug, page=1):
             flash("Category not found.", "error")
             return redirect(url_for("index.home"))
 
-        # Total count
-        cur.execute("""
-            SELECT COUNT(DISTINCT b.id) AS total
-            FROM businesses b
-            JOIN business_categories bc ON b.id = bc.business_id
-            WHERE bc.category_id = %s
-              AND b.status != 'deleted'
-        """, (category["id"],))
-        total = cur.fetchone()["total"]
-
-        # Businesses
+        # Total count (cached, see services.listing)
+        total = listing_count(cur, category["id"])
+
+        # Businesses (flat read-model rows; see services.listing)
         cur.execute("""
-            SELECT
-                b.id,
-                b.business_name,
-                b.slug,
-                b.media_url,
-                b.media_type,
-                b.is_subscribed,
-                b.created_at,
-                u.username AS owner_username,
-                GROUP_CONCAT(DISTINCT c.category_name) AS categories
-            FROM businesses b
-            JOIN business_categories bc ON b.id = bc.business_id
-            JOIN categories c ON bc.category_id = c.id
-            LEFT JOIN users u ON b.owner_id = u.id
-            WHERE bc.category_id = %s
-              AND b.status != 'deleted'
-            GROUP BY b.id
-            ORDER BY b.is_subscribed DESC, b.created_at DESC
+            SELECT bl.*
+            FROM business_listing_category blc
+            JOIN business_listing bl ON bl.id = blc.business_id
+            WHERE blc.category_id = %s
+              AND blc.status != 'deleted'
+            ORDER BY blc.is_subscribed DESC, blc.created_at DESC, blc.business_id DESC
             LIMIT %s OFFSET %s
         """, (category["id"], per_page, offset))
 
@@ -175,11 +157,14 @@ def businesses_by_category(category_slug, page=1):
         """)
         all_categories = cur.fetchall()
         
-        seo = build_seo(
+        # The category's version is its name/slug plus the listed cards' versions
+        seo_key = ('category', category["id"], category["category_name"], category["slug"],
+                   tuple((biz["id"], biz["version"]) for biz in businesses))
+        seo = cached_seo(seo_key, lambda: build_seo(
             title=f'{category["category_name"]} Businesses in Ajah',
             description=f'Browse verified {category["category_name"]} businesses in Ajah and Lekki.',
             schema=category_schema(category, businesses),
-        )
+        ))
 
         return render_template(
             "category/category_businesses.html",
@@ -0,0 +1,54 @@
+import hmac
+from datetime import datetime
+from functools import wraps
+
+from flask import Blueprint, Response, abort, current_app as app, request, session, stream_with_context
+from services.export import FORMATS, export_lines, parse_since
+from utils.db import dedicated_connection
+
+bp = Blueprint('export', __name__, url_prefix='/export')
+
+
+def _token_allowed(token):
+    tokens = [t.strip() for t in (app.config.get('EXPORT_API_TOKENS') or '').split(',') if t.strip()]
+    return any(hmac.compare_digest(token.encode(), t.encode()) for t in tokens)
+
+
+def export_auth_required(f):
+    """Logged-in admins, or partners sending ``Authorization: Bearer <token>``"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if session.get('role') == 'admin':
+            return f(*args, **kwargs)
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() == 'bearer' and token and _token_allowed(token):
+            return f(*args, **kwargs)
+        abort(401)
+    return decorated_function
+
+
+@bp.route('/businesses.<fmt>')
+@export_auth_required
+def export_businesses(fmt):
+    """Stream the directory as NDJSON or CSV; ``?since=`` limits it to recent updates"""
+    if fmt not in FORMATS:
+        abort(404)
+    try:
+        since = parse_since(request.args.get('since'))
+    except ValueError:
+        abort(400, description='since must be an ISO date or datetime')
+
+    # Not the request's pooled connection: see services.export.export_rows
+    conn = dedicated_connection()
+    if not conn:
+        abort(503)
+
+    filename = f"businesses-{datetime.now():%Y%m%d%H%M%S}.{fmt}"
+    return Response(
+        stream_with_context(export_lines(conn, fmt, since)),
+        mimetype=FORMATS[fmt],
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'Cache-Control': 'no-store',
+        },
+    )
@@ -1,64 +1,115 @@
 import traceback
-from flask import Blueprint, jsonify, render_template, session, flash
-from utils.helpers import get_db_connection
+from datetime import datetime
+from flask import Blueprint, jsonify, render_template, request, redirect, session, flash, url_for
+from utils.helpers import decode_cursor, encode_cursor, get_db_connection
 from flask import current_app as app
 
 bp = Blueprint('index', __name__)
 
+PER_PAGE = 12
+
+# Home feed order: premium first, active before anything else, newest first,
+# and id as the tie-breaker so every row has a unique position to seek from.
+# status_rank is precomputed in business_listing (see services.listing).
+ORDER_FORWARD = "bl.is_subscribed DESC, bl.status_rank ASC, bl.created_at DESC, bl.id DESC"
+ORDER_BACKWARD = "bl.is_subscribed ASC, bl.status_rank DESC, bl.created_at ASC, bl.id ASC"
+
+# Rows strictly after / before a (is_subscribed, status_rank, created_at, id)
+# position in feed order. Params: s, s, r, r, created_at, created_at, id
+AFTER_CURSOR = """
+    (bl.is_subscribed < %s
+     OR (bl.is_subscribed = %s AND (bl.status_rank > %s
+         OR (bl.status_rank = %s AND (bl.created_at < %s
+             OR (bl.created_at = %s AND bl.id < %s))))))
+"""
+BEFORE_CURSOR = """
+    (bl.is_subscribed > %s
+     OR (bl.is_subscribed = %s AND (bl.status_rank < %s
+         OR (bl.status_rank = %s AND (bl.created_at > %s
+             OR (bl.created_at = %s AND bl.id > %s))))))
+"""
+
+
+def _cursor_key(biz):
+    return [int(biz['is_subscribed'] or 0), biz['status_rank'], biz['created_at'].isoformat(), biz['id']]
+
+
+def _decode_position(token):
+    """The (is_subscribed, status_rank, created_at, id) packed by _cursor_key, or None if malformed"""
+    values = decode_cursor(token)
+    if not isinstance(values, list) or len(values) != 4:
+        return None
+    is_subscribed, status_rank, created_at, last_id = values
+    if not all(type(value) is int for value in (is_subscribed, status_rank, last_id)) \
+            or not isinstance(created_at, str):
+        return None
+    try:
+        return is_subscribed, status_rank, datetime.fromisoformat(created_at), last_id
+    except ValueError:
+        return None
+
+
+def _feed_query(position=None, backward=False):
+    """SQL and params for a page of the feed (plus one row) after, or with ``backward`` before, ``position``"""
+    where = "bl.status != 'deleted'"
+    params = []
+    if position:
+        is_subscribed, status_rank, created_at, last_id = position
+        where += " AND " + (BEFORE_CURSOR if backward else AFTER_CURSOR)
+        params = [is_subscribed, is_subscribed, status_rank, status_rank, created_at, created_at, last_id]
+    sql = f"""
+        SELECT bl.*
+        FROM business_listing bl
+        WHERE {where}
+        ORDER BY {ORDER_BACKWARD if backward else ORDER_FORWARD}
+        LIMIT %s
+    """
+    return sql, params + [PER_PAGE + 1]
+
+
 @bp.route('/')
-@bp.route('/page/<int:page>')
-def home(page=1):
+def home():
+    """Home feed, paginated by ?after= / ?before= cursor tokens"""
+    after = request.args.get('after')
+    before = request.args.get('before')
+    token = after or before
+    position = _decode_position(token) if token else None
+    if token and position is None:
+        return redirect(url_for('index.home'))
+    backward = bool(position) and not after
+
     conn = None
     try:
         conn = get_db_connection()
         cur = conn.cursor(dictionary=True)
-        
-        # Pagination settings
-        per_page = 12
-        offset = (page - 1) * per_page
-        
-        # Get total count for pagination
-        cur.execute("SELECT COUNT(*) as total FROM businesses WHERE status != 'deleted'")
-        total = cur.fetchone()['total']
-        
-        # Get businesses with subscription status and categories
-        cur.execute("""
-            SELECT 
-                b.*,
-                u.username as owner_username,
-                GROUP_CONCAT(DISTINCT c.category_name SEPARATOR ', ') AS categories,
-                COUNT(DISTINCT c.id) as category_count,
-                MIN(c.category_name) as primary_category
-            FROM businesses b
-            LEFT JOIN users u ON b.owner_id = u.id
-            LEFT JOIN business_categories bc ON b.id = bc.business_id
-            LEFT JOIN categories c ON bc.category_id = c.id
-            WHERE b.status != 'deleted'
-            GROUP BY b.id
-            ORDER BY b.is_subscribed DESC, 
-                     CASE WHEN b.status = 'active' THEN 0 ELSE 1 END,
-                     b.created_at DESC
-            LIMIT %s OFFSET %s
-        """, (per_page, offset))
+
+        # One extra row tells us whether there is another page in this direction
+        cur.execute(*_feed_query(position, backward))
         
         businesses = cur.fetchall()
+        has_more = len(businesses) > PER_PAGE
+        businesses = businesses[:PER_PAGE]
+        if backward:
+            businesses.reverse()
         
         # Process the businesses data
         for biz in businesses:
             biz['additional_categories'] = biz['category_count'] - 1 if biz['category_count'] else 0
         
-        # print(businesses)
+        has_next = bool(businesses) and (True if backward else has_more)
+        has_prev = bool(businesses) and (has_more if backward else bool(position))
         return render_template(
             'index.html', 
             businesses=businesses,
             username=session.get('username'),
             user_profile=session.get('profile_image'),
             pagination={
-                'page': page,
-                'per_page': per_page,
-                'total': total,
-                'has_next': offset + per_page < total,
-                'has_prev': page > 1
+                'mode': 'cursor',
+                'per_page': PER_PAGE,
+                'has_next': has_next,
+                'has_prev': has_prev,
+                'next_url': url_for('index.home', after=encode_cursor(_cursor_key(businesses[-1]))) if has_next else None,
+                'prev_url': url_for('index.home', before=encode_cursor(_cursor_key(businesses[0]))) if has_prev else None,
             })
 
     except Exception as e:
@@ -74,6 +125,37 @@ def home(page=1):
         if conn:
             conn.close()
 
+
+@bp.route('/page/<int:page>')
+def home_page(page):
+    """Legacy OFFSET page URLs: redirect to the equivalent cursor position"""
+    if page <= 1:
+        return redirect(url_for('index.home'))
+
+    conn = None
+    boundary = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor(dictionary=True)
+        # Last row of the previous page
+        cur.execute(f"""
+            SELECT bl.id, bl.is_subscribed, bl.created_at, bl.status_rank
+            FROM business_listing bl
+            WHERE bl.status != 'deleted'
+            ORDER BY {ORDER_FORWARD}
+            LIMIT 1 OFFSET %s
+        """, ((page - 1) * PER_PAGE - 1,))
+        boundary = cur.fetchone()
+    except Exception as e:
+        app.logger.error(f"Error resolving legacy page {page}: {str(e)}")
+    finally:
+        if conn:
+            conn.close()
+
+    if not boundary:
+        return redirect(url_for('index.home'))
+    return redirect(url_for('index.home', after=encode_cursor(_cursor_key(boundary))))
+
 # Add custom routes
 @bp.route("/routes")
 def site_map():
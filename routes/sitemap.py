@@ -0,0 +1,33 @@
+import traceback
+
+from flask import Blueprint, abort, send_file
+from services.sitemap import business_sitemap_path, categories_sitemap_path, sitemap_index_path
+
+bp = Blueprint('sitemap', __name__)
+
+
+def _send(path_for, *args):
+    try:
+        path = path_for(*args)
+    except Exception:
+        traceback.print_exc()
+        abort(503)
+    if path is None:
+        abort(404)
+    return send_file(path, mimetype='application/xml', conditional=True)
+
+
+@bp.route('/sitemap.xml')
+def sitemap_index():
+    """Sitemap index: the categories sitemap plus one sitemap per business id chunk"""
+    return _send(sitemap_index_path)
+
+
+@bp.route('/sitemap-categories.xml')
+def categories_sitemap():
+    return _send(categories_sitemap_path)
+
+
+@bp.route('/sitemap-businesses-<int:chunk>.xml')
+def business_sitemap(chunk):
+    return _send(business_sitemap_path, chunk)
@@ -1,6 +1,9 @@
 import os, traceback
 from flask import Blueprint, current_app as app, request, render_template, redirect, session, url_for, flash
+from services.counters import user_deleted
+from services.listing import refresh_listing, refresh_owner_listings
 from utils.helpers import admin_required, get_db_connection, upload_file
+from utils.media_store import release_business_media, release_media, swap_media
 from werkzeug.security import generate_password_hash
 
 bp = Blueprint('user', __name__)
@@ -53,7 +56,14 @@ def profile():
                 values = list(update_fields.values()) + [user_id]
                 
                 cur = conn.cursor()
+                if 'profile_image' in update_fields:
+                    cur.execute("SELECT profile_image FROM users WHERE id = %s", (user_id,))
+                    current = cur.fetchone()
                 cur.execute(f"UPDATE users SET {set_clause} WHERE id = %s", values)
+                if 'profile_image' in update_fields:
+                    swap_media(cur, current[0] if current else None, update_fields['profile_image'])
+                if 'username' in update_fields:
+                    refresh_owner_listings(cur, user_id)
                 conn.commit()
                 flash('Profile updated successfully!', 'success')
 
@@ -79,31 +89,32 @@ def profile():
             """, (user_id,))
             user = cur.fetchone()
 
-            # MySQL version with GROUP_CONCAT
+            cur.execute("SELECT b.* FROM businesses b WHERE b.owner_id = %s", (user_id,))
+            businesses = cur.fetchall()
+
+            # One row per category from the read model; names may contain
+            # commas, so they are not split out of business_listing.categories
             cur.execute("""
-                SELECT b.*, 
-                       GROUP_CONCAT(DISTINCT c.category_name SEPARATOR '|||') AS category_names,
-                       GROUP_CONCAT(DISTINCT c.id SEPARATOR '|||') AS category_ids
-                FROM businesses b
-                LEFT JOIN business_categories bc ON b.id = bc.business_id
-                LEFT JOIN categories c ON bc.category_id = c.id
+                SELECT blc.business_id, c.category_name
+                FROM business_listing_category blc
+                JOIN businesses b ON b.id = blc.business_id
+                JOIN categories c ON c.id = blc.category_id
                 WHERE b.owner_id = %s
-                GROUP BY b.id
+                ORDER BY c.category_name
             """, (user_id,))
+            category_names = {}
+            for row in cur.fetchall():
+                category_names.setdefault(row['business_id'], []).append(row['category_name'])
 
-            businesses = cur.fetchall()
-            
             # Convert status to display text
             for business in businesses:
                 business['status_display'] = 'Active' if business['status'] == 'active' else \
                                            'Pending' if business['status'] == 'pending' else \
                                            'Suspended'
                 
-                # Convert category strings to lists
-                if business.get('category_names'):
-                    names = business['category_names'].split('|||')
-                    ids = business['category_ids'].split('|||')
-                    business['categories'] = [{'name': name} for name in names]
+                # Convert category names to lists
+                if business['id'] in category_names:
+                    business['categories'] = [{'name': name} for name in category_names[business['id']]]
                 else:
                     # Fallback to single category if exists
                     if business.get('category'):
@@ -187,15 +198,14 @@ def admin_users():
         cur.execute("""
             SELECT 
                 u.*,
-                COUNT(b.id) as business_count,
+                COALESCE(ubc.business_count, 0) as business_count,
                 CASE 
                     WHEN u.role = 'admin' THEN 'Admin'
                     WHEN u.role = 'owner' THEN 'Business Owner'
                     ELSE 'Regular User'
                 END as role_display
             FROM users u
-            LEFT JOIN businesses b ON u.id = b.owner_id
-            GROUP BY u.id
+            LEFT JOIN user_business_counts ubc ON ubc.user_id = u.id
             ORDER BY u.created_at DESC
         """)
         users = cur.fetchall()
@@ -238,7 +248,10 @@ def admin_delete_user(user_id):
             return redirect(url_for('user.admin_users'))
         
         # Delete user
+        cur.execute("SELECT profile_image FROM users WHERE id = %s", (user_id,))
+        release_media(cur, cur.fetchone()['profile_image'])
         cur.execute("DELETE FROM users WHERE id = %s", (user_id,))
+        user_deleted(cur, user_id)
         conn.commit()
         
         flash(f'User "{user["username"]}" has been deleted', 'success')
@@ -282,6 +295,7 @@ def admin_update_business_status(business_id):
             SET status = %s
             WHERE id = %s
         """, (new_status, business_id))
+        refresh_listing(cur, business_id)
         
         conn.commit()
         flash(f'Business "{business["business_name"]}" status updated to {new_status}', 'success')
@@ -380,6 +394,7 @@ def admin_assign_business(business_id):
                 SET owner_id = %s
                 WHERE id = %s
             """, (new_owner_id, business_id))
+            refresh_listing(cur, business_id)
             
             conn.commit()
             flash(f'Business "{business["business_name"]}" assigned to {new_owner["username"]}', 'success')
@@ -464,6 +479,7 @@ def update_business_status(business_id):
             SET status = %s 
             WHERE id = %s
         """, (new_status, business_id))
+        refresh_listing(cur, business_id)
         conn.commit()
 
         flash(f'Business "{business["business_name"]}" status updated to {new_status}.', 'success')
@@ -502,6 +518,7 @@ def update_business_subscription(business_id):
                 SET is_subscribed = %s 
                 WHERE id = %s
             """, (is_subscribed, business_id))
+            refresh_listing(cur, business_id)
             conn.commit()
             flash('Subscription status updated.', 'success')
 
@@ -565,9 +582,11 @@ def delete_business(business_id):
 
         # Delete from join table
         cur.execute("DELETE FROM business_categories WHERE business_id = %s", (business_id,))
+        release_business_media(cur, business_id)
 
         # Delete business
         cur.execute("DELETE FROM businesses WHERE id = %s", (business_id,))
+        refresh_listing(cur, business_id)
 
         conn.commit()
         flash(f'Business "{business_name}" has been deleted.', 'success')
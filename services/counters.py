@@ -0,0 +1,159 @@
+"""Maintained counters for the admin dashboard and user lists.
+
+``stat_counters`` holds the global totals (users, businesses per status,
+subscribed businesses) and ``user_business_counts`` the number of businesses
+each user owns. Both change in the caller's transaction: ``refresh_listing``
+applies the business deltas (the listing row is the "before" snapshot), and
+the user insert/delete paths call ``user_created`` / ``user_deleted``.
+
+Anything that writes around those paths (manual SQL, an out-of-date read
+model) makes the counters drift; ``flask counters reconcile`` recomputes them
+from the source tables.
+"""
+import click
+from flask.cli import AppGroup
+
+from utils.db import get_db_connection
+
+COUNTERS = (
+    'total_users',
+    'total_businesses',
+    'active_businesses',
+    'pending_businesses',
+    'suspended_businesses',
+    'subscribed_businesses',
+)
+
+# Business statuses that have their own counter
+STATUS_COUNTERS = {
+    'active': 'active_businesses',
+    'pending': 'pending_businesses',
+    'suspended': 'suspended_businesses',
+}
+
+BUMP_COUNTER = """
+    INSERT INTO stat_counters (name, value) VALUES (%s, %s)
+    ON DUPLICATE KEY UPDATE value = value + VALUES(value)
+"""
+
+BUMP_OWNER = """
+    INSERT INTO user_business_counts (user_id, business_count) VALUES (%s, %s)
+    ON DUPLICATE KEY UPDATE business_count = business_count + VALUES(business_count)
+"""
+
+
+def _business_state(row):
+    """(owner_id, status, is_subscribed) from a listing row, or None if absent."""
+    if row is None:
+        return None
+    if isinstance(row, dict):
+        return row['owner_id'], row['status'], bool(row['is_subscribed'])
+    return row[0], row[1], bool(row[2])
+
+
+def listing_state(cur, business_id):
+    """Counter-relevant state of one business as the read model has it."""
+    cur.execute("SELECT owner_id, status, is_subscribed FROM business_listing WHERE id = %s", (business_id,))
+    return _business_state(cur.fetchone())
+
+
+def apply_business_change(cur, before, after):
+    """Apply the counter deltas between two ``listing_state`` snapshots."""
+    deltas = {}
+    owners = {}
+
+    for state, sign in ((before, -1), (after, 1)):
+        if state is None:
+            continue
+        owner_id, status, is_subscribed = state
+        deltas['total_businesses'] = deltas.get('total_businesses', 0) + sign
+        if status in STATUS_COUNTERS:
+            name = STATUS_COUNTERS[status]
+            deltas[name] = deltas.get(name, 0) + sign
+        if is_subscribed:
+            deltas['subscribed_businesses'] = deltas.get('subscribed_businesses', 0) + sign
+        if owner_id is not None:
+            owners[owner_id] = owners.get(owner_id, 0) + sign
+
+    for name, delta in deltas.items():
+        if delta:
+            cur.execute(BUMP_COUNTER, (name, delta))
+    for owner_id, delta in owners.items():
+        if delta:
+            cur.execute(BUMP_OWNER, (owner_id, delta))
+
+
+def user_created(cur):
+    """Count a newly inserted user; call before committing the insert."""
+    cur.execute(BUMP_COUNTER, ('total_users', 1))
+
+
+def user_deleted(cur, user_id):
+    """Uncount a deleted user; call before committing the delete."""
+    cur.execute(BUMP_COUNTER, ('total_users', -1))
+    cur.execute("DELETE FROM user_business_counts WHERE user_id = %s", (user_id,))
+
+
+def dashboard_stats(cur):
+    """All global counters as a dict (missing ones read as 0)."""
+    cur.execute("SELECT name, value FROM stat_counters")
+    stats = dict.fromkeys(COUNTERS, 0)
+    for row in cur.fetchall():
+        name, value = (row['name'], row['value']) if isinstance(row, dict) else row
+        stats[name] = int(value)
+    return stats
+
+
+def reconcile(cur):
+    """Recompute every counter from ``users`` and ``businesses``."""
+    cur.execute("""
+        SELECT
+            (SELECT COUNT(*) FROM users) AS total_users,
+            COUNT(*) AS total_businesses,
+            COALESCE(SUM(status = 'active'), 0) AS active_businesses,
+            COALESCE(SUM(status = 'pending'), 0) AS pending_businesses,
+            COALESCE(SUM(status = 'suspended'), 0) AS suspended_businesses,
+            COALESCE(SUM(is_subscribed = TRUE), 0) AS subscribed_businesses
+        FROM businesses
+    """)
+    row = cur.fetchone()
+    values = row if isinstance(row, dict) else dict(zip(COUNTERS, row))
+    for name in COUNTERS:
+        cur.execute("""
+            INSERT INTO stat_counters (name, value) VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE value = VALUES(value)
+        """, (name, int(values[name])))
+
+    cur.execute("DELETE FROM user_business_counts")
+    cur.execute("""
+        INSERT INTO user_business_counts (user_id, business_count)
+        SELECT owner_id, COUNT(*) FROM businesses
+        WHERE owner_id IS NOT NULL
+        GROUP BY owner_id
+    """)
+
+
+counters_cli = AppGroup('counters', help='Maintain the admin dashboard counters.')
+
+
+@counters_cli.command('reconcile')
+def reconcile_command():
+    """Recompute all counters from the source tables (repairs drift)."""
+    conn = get_db_connection()
+    if not conn:
+        raise click.ClickException('Could not connect to the database.')
+    try:
+        cur = conn.cursor(dictionary=True)
+        before = dashboard_stats(cur)
+        reconcile(cur)
+        conn.commit()
+        after = dashboard_stats(cur)
+        for name in COUNTERS:
+            drift = after[name] - before[name]
+            note = f" (drift {drift:+d})" if drift else ""
+            click.echo(f"{name}: {after[name]}{note}")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
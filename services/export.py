@@ -0,0 +1,154 @@
+"""Directory export as NDJSON or CSV.
+
+``export_rows`` reads ``business_listing`` through an unbuffered cursor and
+yields one row at a time, and the formatters turn rows into lines as they
+arrive, so memory stays flat however large the table is. Rows come in
+``(updated_at, id)`` order (``ix_business_listing_updated``): a client can
+pass the last ``updated_at`` it saw as ``since`` next time to fetch only
+what changed. ``since`` is inclusive, so a row updated in that same second
+is sent again.
+
+Served by ``GET /export/businesses.<fmt>`` (routes.export) and by
+``flask export businesses``.
+"""
+import csv
+import io
+import json
+import sys
+from datetime import date, datetime
+from decimal import Decimal
+
+import click
+from flask.cli import AppGroup
+
+from utils.db import dedicated_connection
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+EXPORT_COLUMNS = (
+    'id', 'business_name', 'slug', 'description', 'shop_no', 'block_num',
+    'phone_number', 'email', 'website_url', 'facebook_link', 'instagram_link',
+    'media_type', 'media_url', 'is_subscribed', 'status', 'owner_username',
+    'categories', 'created_at', 'updated_at',
+)
+
+# Unit separator: category names may contain commas
+CATEGORY_SEPARATOR = '\x1f'
+
+EXPORT_QUERY = f"""
+    SELECT bl.id, bl.business_name, bl.slug, bl.description, bl.shop_no, bl.block_num,
+           bl.phone_number, bl.email, bl.website_url, bl.facebook_link, bl.instagram_link,
+           bl.media_type, bl.media_url, bl.is_subscribed, bl.status, bl.owner_username,
+           (SELECT GROUP_CONCAT(c.category_name ORDER BY c.category_name SEPARATOR '{CATEGORY_SEPARATOR}')
+            FROM business_categories bc
+            JOIN categories c ON c.id = bc.category_id
+            WHERE bc.business_id = bl.id) AS categories,
+           bl.created_at, bl.updated_at
+    FROM business_listing bl
+    WHERE bl.status != 'deleted' AND bl.updated_at >= %s
+    ORDER BY bl.updated_at, bl.id
+"""
+
+
+def parse_since(value):
+    """``since`` as a datetime (ISO date or datetime); None/'' means everything."""
+    if not value:
+        return datetime(1970, 1, 1)
+    return datetime.fromisoformat(value)
+
+
+def export_rows(conn, since=None):
+    """Yield one dict per business, streamed from the server.
+
+    ``conn`` should be a ``dedicated_connection``. If the consumer stops early
+    (a client disconnecting mid-download), the unread rows are still on the
+    wire, so the connection is shut down instead of drained or pooled.
+    """
+    cur = conn.cursor(buffered=False)
+    finished = False
+    try:
+        cur.execute(EXPORT_QUERY, (since or datetime(1970, 1, 1),))
+        for row in cur:
+            row = dict(zip(EXPORT_COLUMNS, row))
+            row['categories'] = row['categories'].split(CATEGORY_SEPARATOR) if row['categories'] else []
+            row['is_subscribed'] = bool(row['is_subscribed'])
+            yield row
+        finished = True
+    finally:
+        if finished:
+            cur.close()
+        else:
+            conn.shutdown()
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps({k: _plain(v) for k, v in row.items()}, ensure_ascii=False) + '\n'
+
+
+def csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        writer.writerow(values)
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+
+    yield line(EXPORT_COLUMNS)
+    for row in rows:
+        row['categories'] = '; '.join(row['categories'])
+        yield line(_plain(row[column]) for column in EXPORT_COLUMNS)
+
+
+def export_lines(conn, fmt, since=None):
+    """Formatted lines of the export; closes ``conn`` once they stop."""
+    formatter = ndjson_lines if fmt == 'ndjson' else csv_lines
+    rows = export_rows(conn, since)
+    try:
+        yield from formatter(rows)
+    finally:
+        rows.close()
+        conn.close()
+
+
+export_cli = AppGroup('export', help='Export directory data.')
+
+
+@export_cli.command('businesses')
+@click.option('--format', 'fmt', type=click.Choice(sorted(FORMATS)), default='ndjson', show_default=True)
+@click.option('--since', default=None, help='Only businesses updated at or after this ISO date/datetime.')
+@click.option('--output', '-o', type=click.Path(dir_okay=False, writable=True), default=None,
+              help='File to write (default: stdout).')
+def export_businesses_command(fmt, since, output):
+    """Stream every non-deleted business with its categories."""
+    try:
+        since = parse_since(since)
+    except ValueError:
+        raise click.BadParameter('expected an ISO date or datetime', param_hint='--since')
+
+    conn = dedicated_connection()
+    if not conn:
+        raise click.ClickException('Could not connect to the database.')
+    out = open(output, 'w', encoding='utf-8', newline='') if output else sys.stdout
+    lines = export_lines(conn, fmt, since)
+    try:
+        for line in lines:
+            out.write(line)
+    finally:
+        lines.close()
+        if output:
+            out.close()
@@ -0,0 +1,200 @@
+"""Denormalized read model for business cards.
+
+``business_listing`` holds one flat row per business with exactly what
+``_partials/_business_card.html`` needs (owner username, category names,
+primary category, category count, ...). ``business_listing_category`` maps
+category -> business and carries the sort keys, so category pages never
+aggregate. Listing pages read these tables directly instead of joining
+businesses/users/business_categories/categories and GROUP BY-ing per request.
+
+Every write path that touches a business calls ``refresh_listing`` with its
+own cursor before committing, so the read model changes in the same
+transaction as the source rows. ``flask listings rebuild`` repopulates both
+tables from scratch; the tables themselves come from the migrations.
+
+Pagination totals (``listing_count``) are cached per worker and dropped by
+``refresh_listing``, so listing pages don't run a COUNT(*) per view.
+``refresh_listing`` also applies the admin counter deltas (services.counters),
+using the listing row as it was before the refresh, and purges the anonymous
+page cache (utils.page_cache). Each refresh bumps ``business_listing.version``,
+which keys the cached business card fragment (utils.fragment_cache), and
+queues the business for the similar-business worker (services.recommend). The
+slug resolution cache (services.slugs) is cleared along with the counts, and
+the sitemap chunk holding the business is regenerated (services.sitemap).
+Writes to categories or plans call ``invalidate_reference_data`` instead.
+"""
+import click
+from flask.cli import AppGroup
+
+from config import Config
+from services.counters import apply_business_change, listing_state
+from services.recommend import queue_neighbours
+from services.sitemap import invalidate_business_sitemap, invalidate_category_sitemap, invalidate_sitemaps
+from services.slugs import invalidate_slugs
+from utils.cache import TTLCache
+from utils.db import get_db_connection
+from utils.helpers import invalidate_reference_cache
+from utils.page_cache import invalidate_pages
+
+# ('all',) / ('category', id) -> number of non-deleted listings
+count_cache = TTLCache(ttl=Config.LISTING_COUNT_TTL)
+
+# Same ranking the home feed sorts by: active first, everything else after.
+STATUS_RANK = "CASE WHEN b.status = 'active' THEN 0 ELSE 1 END"
+
+# created_at is a feed sort key (and part of the keyset cursor), so it can't
+# be NULL in the read model; legacy rows without one sort as the oldest
+CREATED_AT = "COALESCE(b.created_at, '1970-01-01 00:00:00')"
+
+UPSERT_LISTING = f"""
+    INSERT INTO business_listing (
+        id, owner_id, owner_username, business_name, slug, description,
+        shop_no, block_num, phone_number, email, website_url, facebook_link,
+        instagram_link, media_type, media_url, media_variants, is_subscribed, status, status_rank,
+        created_at, categories, primary_category, category_count
+    )
+    SELECT
+        b.id, b.owner_id, u.username, b.business_name, b.slug, b.description,
+        b.shop_no, b.block_num, b.phone_number, b.email, b.website_url, b.facebook_link,
+        b.instagram_link, b.media_type, b.media_url, b.media_variants, COALESCE(b.is_subscribed, 0), b.status,
+        {STATUS_RANK},
+        {CREATED_AT},
+        -- Display only: names may contain ', ', so code that needs them one
+        -- by one reads business_listing_category
+        GROUP_CONCAT(DISTINCT c.category_name ORDER BY c.category_name SEPARATOR ', '),
+        MIN(c.category_name),
+        COUNT(DISTINCT c.id)
+    FROM businesses b
+    LEFT JOIN users u ON b.owner_id = u.id
+    LEFT JOIN business_categories bc ON b.id = bc.business_id
+    LEFT JOIN categories c ON bc.category_id = c.id
+    {{where}}
+    GROUP BY b.id
+    ON DUPLICATE KEY UPDATE
+        owner_id = VALUES(owner_id),
+        owner_username = VALUES(owner_username),
+        business_name = VALUES(business_name),
+        slug = VALUES(slug),
+        description = VALUES(description),
+        shop_no = VALUES(shop_no),
+        block_num = VALUES(block_num),
+        phone_number = VALUES(phone_number),
+        email = VALUES(email),
+        website_url = VALUES(website_url),
+        facebook_link = VALUES(facebook_link),
+        instagram_link = VALUES(instagram_link),
+        media_type = VALUES(media_type),
+        media_url = VALUES(media_url),
+        media_variants = VALUES(media_variants),
+        is_subscribed = VALUES(is_subscribed),
+        status = VALUES(status),
+        status_rank = VALUES(status_rank),
+        created_at = VALUES(created_at),
+        categories = VALUES(categories),
+        primary_category = VALUES(primary_category),
+        category_count = VALUES(category_count),
+        version = version + 1
+"""
+
+INSERT_MEMBERSHIP = f"""
+    INSERT INTO business_listing_category (category_id, business_id, is_subscribed, status, created_at)
+    SELECT DISTINCT bc.category_id, b.id, COALESCE(b.is_subscribed, 0), b.status, {CREATED_AT}
+    FROM businesses b
+    JOIN business_categories bc ON b.id = bc.business_id
+    {{where}}
+"""
+
+
+def refresh_listing(cur, business_id):
+    """Rebuild the read-model rows for one business in the caller's transaction.
+
+    Works for inserts, updates and hard deletes alike; the caller commits.
+    """
+    before = listing_state(cur, business_id)
+    cur.execute(UPSERT_LISTING.format(where="WHERE b.id = %s"), (business_id,))
+    cur.execute("""
+        DELETE FROM business_listing
+        WHERE id = %s AND NOT EXISTS (SELECT 1 FROM businesses WHERE id = %s)
+    """, (business_id, business_id))
+    cur.execute("DELETE FROM business_listing_category WHERE business_id = %s", (business_id,))
+    cur.execute(INSERT_MEMBERSHIP.format(where="WHERE b.id = %s"), (business_id,))
+    apply_business_change(cur, before, listing_state(cur, business_id))
+    queue_neighbours(cur, business_id)
+    count_cache.invalidate()
+    invalidate_slugs()
+    invalidate_pages()
+    invalidate_business_sitemap(business_id)
+
+
+def invalidate_reference_data():
+    """Call after writing categories or subscription_plans.
+
+    Drops the cached reference data (utils.helpers) and the anonymous pages
+    and category sitemap that list it.
+    """
+    invalidate_reference_cache()
+    invalidate_pages()
+    invalidate_category_sitemap()
+
+
+def refresh_owner_listings(cur, owner_id):
+    """Propagate a username change to the owner's listing rows."""
+    cur.execute("""
+        UPDATE business_listing
+        SET owner_username = (SELECT username FROM users WHERE id = %s)
+        WHERE owner_id = %s
+    """, (owner_id, owner_id))
+
+
+def listing_count(cur, category_id=None):
+    """Number of non-deleted listings, overall or in one category (cached)."""
+    if category_id is None:
+        key = ('all',)
+        sql, params = "SELECT COUNT(*) AS total FROM business_listing WHERE status != 'deleted'", ()
+    else:
+        key = ('category', int(category_id))
+        sql = """
+            SELECT COUNT(*) AS total FROM business_listing_category
+            WHERE category_id = %s AND status != 'deleted'
+        """
+        params = (category_id,)
+
+    def load():
+        cur.execute(sql, params)
+        row = cur.fetchone()
+        return row['total'] if isinstance(row, dict) else row[0]
+
+    return count_cache.get(key, load)
+
+
+def rebuild_all(cur):
+    """Repopulate the whole read model from the source tables."""
+    cur.execute(UPSERT_LISTING.format(where=""))
+    cur.execute("DELETE FROM business_listing WHERE id NOT IN (SELECT id FROM businesses)")
+    cur.execute("DELETE FROM business_listing_category")
+    cur.execute(INSERT_MEMBERSHIP.format(where=""))
+
+
+listings_cli = AppGroup('listings', help='Maintain the business_listing read model.')
+
+
+@listings_cli.command('rebuild')
+def rebuild_command():
+    """Fully repopulate the listing tables (run `flask db upgrade` first)."""
+    conn = get_db_connection()
+    if not conn:
+        raise click.ClickException('Could not connect to the database.')
+    try:
+        cur = conn.cursor()
+        rebuild_all(cur)
+        conn.commit()
+        count_cache.invalidate()
+        invalidate_pages()
+        invalidate_sitemaps()
+        cur.execute("SELECT COUNT(*) FROM business_listing")
+        click.echo(f"Rebuilt business_listing: {cur.fetchone()[0]} rows.")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
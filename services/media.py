@@ -0,0 +1,331 @@
+"""Maintenance commands for uploaded media.
+
+``flask media variants`` builds the responsive image variants (utils.images)
+for uploads that predate the pipeline, or for all of them with ``--force``.
+``flask media gc`` deletes stored files nothing references any more, and
+``flask media import-legacy`` moves flat ``static/uploads/<name>`` uploads into
+the content-addressed store (utils.media_store). ``flask media videos`` moves
+the index of existing MP4/MOV uploads to the front (utils.mp4) and records
+their duration and size (utils.videos).
+"""
+import os
+import re
+import time
+
+import click
+from flask import current_app as app
+from flask.cli import AppGroup
+
+from utils.db import get_db_connection
+from utils.images import Image, image_variants
+from utils.media_store import parse_upload_url, retain_media, store_stream, swap_media, upload_dir
+from utils.mp4 import FASTSTART_EXTENSIONS
+from utils.page_cache import invalidate_pages
+from utils.videos import video_metadata
+
+STORED_NAME = re.compile(r'^([0-9a-f]{64})\.[a-z0-9]+$')
+SHARD = re.compile(r'^[0-9a-f]{2}$')
+
+# media slot -> (url column, type column, variants column)
+MEDIA_SLOTS = (
+    ('media_url', 'media_type', 'media_variants'),
+    ('media_url_2', 'media_type_2', 'media_variants_2'),
+)
+
+media_cli = AppGroup('media', help='Maintain uploaded media.')
+
+
+@media_cli.command('variants')
+@click.option('--force', is_flag=True, help='Rebuild variants that already exist.')
+@click.option('--batch-size', default=100, show_default=True, help='Businesses per transaction.')
+def variants_command(force, batch_size):
+    """Build image variants for existing uploads, committing per batch."""
+    if Image is None:
+        raise click.ClickException('Pillow is not installed (pip install Pillow).')
+    conn = get_db_connection()
+    if not conn:
+        raise click.ClickException('Could not connect to the database.')
+
+    missing = '' if force else ' AND {variants} IS NULL'
+    pending = ' OR '.join(
+        f"({type_col} = 'image' AND {url_col} IS NOT NULL{missing.format(variants=variants_col)})"
+        for url_col, type_col, variants_col in MEDIA_SLOTS
+    )
+    built = skipped = 0
+    last_id = 0
+    try:
+        cur = conn.cursor(dictionary=True)
+        while True:
+            cur.execute(f"""
+                SELECT id, media_url, media_type, media_variants, media_url_2, media_type_2, media_variants_2
+                FROM businesses
+                WHERE id > %s AND ({pending})
+                ORDER BY id
+                LIMIT %s
+            """, (last_id, batch_size))
+            batch = cur.fetchall()
+            if not batch:
+                break
+
+            for row in batch:
+                for url_col, type_col, variants_col in MEDIA_SLOTS:
+                    if row[type_col] != 'image' or not row[url_col] or (row[variants_col] and not force):
+                        continue
+                    variants = image_variants(row[url_col])
+                    if variants is None:
+                        skipped += 1
+                        continue
+                    cur.execute(f"UPDATE businesses SET {variants_col} = %s WHERE id = %s", (variants, row['id']))
+                    built += 1
+            # Cards read the primary slot from the read model; copy it across
+            # directly (a full refresh_listing per row would rerun the recommender)
+            ids = [row['id'] for row in batch]
+            placeholders = ', '.join(['%s'] * len(ids))
+            cur.execute(f"""
+                UPDATE business_listing bl
+                JOIN businesses b ON b.id = bl.id
+                SET bl.media_variants = b.media_variants, bl.version = bl.version + 1
+                WHERE bl.id IN ({placeholders})
+            """, ids)
+            conn.commit()
+            last_id = ids[-1]
+            click.echo(f"Processed businesses up to id {last_id}: {built} images done, {skipped} skipped...")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    if built:
+        invalidate_pages()
+    click.echo(f"Done: built variants for {built} images ({skipped} missing or undecodable).")
+
+
+def _old_enough(path, cutoff):
+    try:
+        return os.path.getmtime(path) < cutoff
+    except FileNotFoundError:
+        return False
+
+
+def _remove_stored(directory, digest, cutoff):
+    """Delete a stored file and its variants unless it was (re)uploaded within the grace period."""
+    names = [n for n in os.listdir(directory) if n.startswith(digest)]
+    primary = [n for n in names if STORED_NAME.match(n)]
+    if any(not _old_enough(os.path.join(directory, n), cutoff) for n in primary):
+        return 0
+    for name in names:
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+    return len(names)
+
+
+def _shard_dirs(root):
+    for first in sorted(os.listdir(root)):
+        if SHARD.match(first) and os.path.isdir(os.path.join(root, first)):
+            for second in sorted(os.listdir(os.path.join(root, first))):
+                directory = os.path.join(root, first, second)
+                if SHARD.match(second) and os.path.isdir(directory):
+                    yield directory
+
+
+@media_cli.command('gc')
+@click.option('--grace', type=int, default=None,
+              help='Seconds a file must have been unreferenced first (MEDIA_GC_GRACE).')
+@click.option('--dry-run', is_flag=True, help='Only report what would be deleted.')
+def gc_command(grace, dry_run):
+    """Delete stored uploads that no row references."""
+    grace = app.config['MEDIA_GC_GRACE'] if grace is None else grace
+    cutoff = time.time() - grace
+    root = upload_dir()
+    conn = get_db_connection()
+    if not conn:
+        raise click.ClickException('Could not connect to the database.')
+
+    released = orphans = files = 0
+    try:
+        cur = conn.cursor(dictionary=True)
+        # Files whose last reference went away more than `grace` ago
+        cur.execute("""
+            SELECT digest, path FROM media_objects
+            WHERE refcount = 0 AND released_at < NOW() - INTERVAL %s SECOND
+        """, (grace,))
+        for row in cur.fetchall():
+            released += 1
+            if dry_run:
+                continue
+            # Re-check under the delete: a new upload may have retained it since
+            cur.execute("DELETE FROM media_objects WHERE digest = %s AND refcount = 0", (row['digest'],))
+            conn.commit()
+            if cur.rowcount:
+                files += _remove_stored(os.path.dirname(os.path.join(root, row['path'])), row['digest'], cutoff)
+
+        # Files no row ever referenced (their transaction rolled back)
+        for directory in _shard_dirs(root):
+            stored = {m.group(1) for m in map(STORED_NAME.match, os.listdir(directory)) if m}
+            if not stored:
+                continue
+            placeholders = ', '.join(['%s'] * len(stored))
+            cur.execute(f"SELECT digest FROM media_objects WHERE digest IN ({placeholders})", list(stored))
+            known = {row['digest'] for row in cur.fetchall()}
+            for digest in stored - known:
+                orphans += 1
+                if not dry_run:
+                    files += _remove_stored(directory, digest, cutoff)
+            conn.commit()
+    finally:
+        conn.close()
+
+    # Temp files left by interrupted uploads
+    tmp_dir = os.path.join(root, 'tmp')
+    if os.path.isdir(tmp_dir) and not dry_run:
+        for name in os.listdir(tmp_dir):
+            path = os.path.join(tmp_dir, name)
+            if _old_enough(path, cutoff):
+                os.remove(path)
+
+    verb = 'Would remove' if dry_run else 'Removed'
+    click.echo(f"{verb} {released} released and {orphans} unreferenced uploads ({files} files deleted).")
+
+
+# table -> (url column, type column or None, variants column or None)
+LEGACY_COLUMNS = {
+    'businesses': (
+        ('media_url', 'media_type', 'media_variants'),
+        ('media_url_2', 'media_type_2', 'media_variants_2'),
+    ),
+    'users': (
+        ('profile_image', None, None),
+    ),
+}
+
+
+@media_cli.command('import-legacy')
+def import_legacy_command():
+    """Copy flat static/uploads/<name> files still in use into the store and repoint their rows.
+
+    The old files are left in place; delete them by hand once nothing links to them.
+    """
+    root = upload_dir()
+    conn = get_db_connection()
+    if not conn:
+        raise click.ClickException('Could not connect to the database.')
+
+    moved = missing = 0
+    try:
+        cur = conn.cursor(dictionary=True)
+        for table, columns in LEGACY_COLUMNS.items():
+            selected = ', '.join(c for column in columns for c in column if c)
+            cur.execute(f"SELECT id, {selected} FROM {table} ORDER BY id")
+            for row in cur.fetchall():
+                changes = {}
+                for url_column, type_column, variants_column in columns:
+                    url = row[url_column]
+                    if not url or '/static/uploads/' not in url or parse_upload_url(url):
+                        continue
+                    prefix, name = url.split('/static/uploads/', 1)
+                    path = os.path.join(root, name)
+                    if '/' in name or '.' not in name or not os.path.isfile(path):
+                        missing += 1
+                        continue
+                    with open(path, 'rb') as f:
+                        relative, _digest, _size = store_stream(f, name.rsplit('.', 1)[1].lower())
+                    new_url = f"{prefix}/static/uploads/{relative}"
+                    retain_media(cur, new_url)
+                    changes[url_column] = new_url
+                    if variants_column and row[type_column] == 'image':
+                        changes[variants_column] = image_variants(new_url)
+                    moved += 1
+                if not changes:
+                    continue
+                set_clause = ', '.join(f"{column} = %s" for column in changes)
+                cur.execute(f"UPDATE {table} SET {set_clause} WHERE id = %s", list(changes.values()) + [row['id']])
+                if table == 'businesses':
+                    cur.execute("""
+                        UPDATE business_listing bl
+                        JOIN businesses b ON b.id = bl.id
+                        SET bl.media_url = b.media_url, bl.media_variants = b.media_variants,
+                            bl.version = bl.version + 1
+                        WHERE bl.id = %s
+                    """, (row['id'],))
+                conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    if moved:
+        invalidate_pages()
+    click.echo(f"Imported {moved} uploads ({missing} referenced files were missing).")
+
+
+@media_cli.command('videos')
+@click.option('--force', is_flag=True, help='Also redo videos that already have metadata.')
+def videos_command(force):
+    """Rewrite existing MP4/MOV uploads for fast start and record their metadata."""
+    root = upload_dir()
+    conn = get_db_connection()
+    if not conn:
+        raise click.ClickException('Could not connect to the database.')
+
+    missing = '' if force else ' AND {variants} IS NULL'
+    pending = ' OR '.join(
+        f"({type_col} = 'video' AND {url_col} IS NOT NULL{missing.format(variants=variants_col)})"
+        for url_col, type_col, variants_col in MEDIA_SLOTS
+    )
+    done = skipped = 0
+    try:
+        cur = conn.cursor(dictionary=True)
+        cur.execute(f"""
+            SELECT id, media_url, media_type, media_variants, media_url_2, media_type_2, media_variants_2
+            FROM businesses
+            WHERE {pending}
+            ORDER BY id
+        """)
+        for row in cur.fetchall():
+            changes = {}
+            for url_col, type_col, variants_col in MEDIA_SLOTS:
+                url = row[url_col]
+                if row[type_col] != 'video' or not url or (row[variants_col] and not force):
+                    continue
+                if '/static/uploads/' not in url or url.rsplit('.', 1)[-1].lower() not in FASTSTART_EXTENSIONS:
+                    skipped += 1
+                    continue
+                prefix, relative = url.split('/static/uploads/', 1)
+                path = os.path.join(root, relative)
+                if not os.path.isfile(path):
+                    skipped += 1
+                    continue
+                # Re-storing runs faststart; a changed file gets a new address
+                with open(path, 'rb') as f:
+                    new_relative, _digest, _size = store_stream(f, relative.rsplit('.', 1)[1].lower())
+                new_url = f"{prefix}/static/uploads/{new_relative}"
+                if new_url != url:
+                    swap_media(cur, url, new_url)
+                    changes[url_col] = new_url
+                changes[variants_col] = video_metadata(new_url)
+                done += 1
+            if not changes:
+                continue
+            set_clause = ', '.join(f"{column} = %s" for column in changes)
+            cur.execute(f"UPDATE businesses SET {set_clause} WHERE id = %s", list(changes.values()) + [row['id']])
+            cur.execute("""
+                UPDATE business_listing bl
+                JOIN businesses b ON b.id = bl.id
+                SET bl.media_url = b.media_url, bl.media_variants = b.media_variants,
+                    bl.version = bl.version + 1
+                WHERE bl.id = %s
+            """, (row['id'],))
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    if done:
+        invalidate_pages()
+    click.echo(f"Processed {done} videos ({skipped} missing or not MP4/MOV).")
@@ -0,0 +1,265 @@
+"""Outgoing mail queue.
+
+Routes build the message (links need the request context) and
+``enqueue_email`` stores it in ``email_outbox`` inside the route's own
+transaction, so a request never waits on SMTP and a rolled-back signup
+never sends a mail.
+
+``flask outbox work`` delivers the queue. Each pass claims a batch by
+stamping ``locked_by``/``locked_until`` on due rows (several workers can run
+side by side; a crashed worker's lease simply expires), sends the batch over
+one SMTP connection, and keeps that connection open while there is work.
+Every outcome is committed per message, so a crash resends at most the mail
+in flight. Failures are retried with exponential backoff
+(``OUTBOX_RETRY_BASE`` doubling up to ``OUTBOX_RETRY_MAX`` seconds); 5xx
+rejections and mails that used up ``OUTBOX_MAX_ATTEMPTS`` are marked
+``failed``.
+
+``flask outbox smtp-stub`` runs a local SMTP server (utils.smtp_stub) that
+accepts everything and writes it to disk, for development and tests.
+"""
+import os
+import random
+import signal
+import smtplib
+import socket
+import time
+import uuid
+
+import click
+from flask import current_app as app
+from flask.cli import AppGroup
+from flask_mail import BadHeaderError, Message
+
+from utils.db import get_db_connection
+from utils.smtp_stub import SMTPStub
+
+ENQUEUE = """
+    INSERT INTO email_outbox (kind, recipient, sender, subject, html_body)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+
+CLAIM = """
+    UPDATE email_outbox
+    SET locked_by = %s, locked_until = NOW() + INTERVAL %s SECOND
+    WHERE status = 'pending' AND next_attempt_at <= NOW()
+      AND (locked_until IS NULL OR locked_until < NOW())
+    ORDER BY id
+    LIMIT %s
+"""
+
+
+def enqueue_email(cur, kind, message):
+    """Queue a built ``flask_mail.Message``, one row per recipient. Runs in the caller's transaction."""
+    sender = message.sender or app.config['MAIL_DEFAULT_SENDER']
+    if isinstance(sender, tuple):
+        sender = f"{sender[0]} <{sender[1]}>"
+    cur.executemany(ENQUEUE, [
+        (kind, recipient, sender, message.subject, message.html or message.body or '')
+        for recipient in message.recipients
+    ])
+
+
+def retry_delay(attempts):
+    """Seconds before attempt ``attempts + 1``: exponential, capped, with 10% jitter."""
+    delay = min(app.config['OUTBOX_RETRY_BASE'] * 2 ** (attempts - 1), app.config['OUTBOX_RETRY_MAX'])
+    return int(delay * random.uniform(0.9, 1.1))
+
+
+def _connection_error(exc):
+    """Failures of the SMTP connection itself: the next message would fail the same way."""
+    if isinstance(exc, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    # SMTPException subclasses OSError; everything else here is socket-level
+    return isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException)
+
+
+def _permanent(exc):
+    """5xx answers to this message (not to the connection) won't succeed on retry."""
+    if isinstance(exc, BadHeaderError):
+        return True
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(500 <= code < 600 for code, _ in exc.recipients.values())
+    if _connection_error(exc):
+        return False
+    return isinstance(exc, smtplib.SMTPResponseException) and 500 <= exc.smtp_code < 600
+
+
+class SMTPSession:
+    """One flask_mail connection, opened on first send and reused until closed."""
+
+    def __init__(self, mail):
+        self.mail = mail
+        self._conn = None
+
+    def send(self, message):
+        if self._conn is None:
+            conn = self.mail.connect()
+            conn.__enter__()
+            self._conn = conn
+        self._conn.send(message)
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                conn.__exit__(None, None, None)
+            except (smtplib.SMTPException, OSError):
+                pass
+
+
+class OutboxWorker:
+    def __init__(self, conn, batch_size=None):
+        self.conn = conn
+        self.cur = conn.cursor(dictionary=True)
+        self.batch_size = batch_size or app.config['OUTBOX_BATCH_SIZE']
+        # Stored in locked_by (64 chars): short hostname, cut so FQDNs and
+        # container ids fit
+        self.worker_id = f"{socket.gethostname().split('.')[0][:40]}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.smtp = SMTPSession(app.extensions['mail'])
+        self.stopping = False
+        self.smtp_down = False
+
+    def claim(self):
+        self.cur.execute(CLAIM, (self.worker_id, app.config['OUTBOX_LEASE'], self.batch_size))
+        self.cur.execute("""
+            SELECT id, kind, recipient, sender, subject, html_body, attempts
+            FROM email_outbox
+            WHERE locked_by = %s AND status = 'pending'
+            ORDER BY id
+        """, (self.worker_id,))
+        rows = self.cur.fetchall()
+        self.conn.commit()
+        return rows
+
+    def _sent(self, row):
+        self.cur.execute("""
+            UPDATE email_outbox
+            SET status = 'sent', attempts = attempts + 1, sent_at = NOW(),
+                locked_by = NULL, locked_until = NULL, last_error = NULL
+            WHERE id = %s
+        """, (row['id'],))
+
+    def _failed(self, row, exc):
+        attempts = row['attempts'] + 1
+        give_up = _permanent(exc) or attempts >= app.config['OUTBOX_MAX_ATTEMPTS']
+        self.cur.execute("""
+            UPDATE email_outbox
+            SET status = %s, attempts = %s, last_error = %s,
+                next_attempt_at = NOW() + INTERVAL %s SECOND,
+                locked_by = NULL, locked_until = NULL
+            WHERE id = %s
+        """, ('failed' if give_up else 'pending', attempts, f"{type(exc).__name__}: {exc}"[:2000],
+              0 if give_up else retry_delay(attempts), row['id']))
+        app.logger.warning(
+            f"Outbox mail {row['id']} to {row['recipient']} failed (attempt {attempts})"
+            f"{', giving up' if give_up else ''}: {exc}"
+        )
+
+    def _release(self, rows):
+        """Hand unsent claimed rows back without counting an attempt."""
+        if rows:
+            placeholders = ', '.join(['%s'] * len(rows))
+            self.cur.execute(f"""
+                UPDATE email_outbox SET locked_by = NULL, locked_until = NULL
+                WHERE id IN ({placeholders}) AND locked_by = %s
+            """, [row['id'] for row in rows] + [self.worker_id])
+            self.conn.commit()
+
+    def deliver(self, rows):
+        """Send claimed rows; returns how many went out.
+
+        Stops at the first connection-level error and hands the rest back.
+        """
+        sent = 0
+        self.smtp_down = False
+        for index, row in enumerate(rows):
+            if self.stopping:
+                self._release(rows[index:])
+                break
+            message = Message(subject=row['subject'], recipients=[row['recipient']],
+                              html=row['html_body'], sender=row['sender'])
+            try:
+                self.smtp.send(message)
+            except Exception as e:
+                self._failed(row, e)
+                if _connection_error(e):
+                    self.smtp.close()
+                    self.conn.commit()
+                    self._release(rows[index + 1:])
+                    self.smtp_down = True
+                    break
+            else:
+                self._sent(row)
+                sent += 1
+            self.conn.commit()
+        return sent
+
+    def run(self, once=False, interval=None):
+        interval = interval or app.config['OUTBOX_POLL_INTERVAL']
+        total = 0
+        try:
+            while not self.stopping:
+                self.conn.ping(reconnect=True)
+                rows = self.claim()
+                if rows:
+                    total += self.deliver(rows)
+                    if self.smtp_down and not once:
+                        time.sleep(interval)
+                    continue
+                # Idle: drop the SMTP connection before the server times it out
+                self.smtp.close()
+                if once:
+                    break
+                time.sleep(interval)
+        finally:
+            self.smtp.close()
+        return total
+
+
+outbox_cli = AppGroup('outbox', help='Deliver queued emails.')
+
+
+@outbox_cli.command('work')
+@click.option('--once', is_flag=True, help='Exit when the queue is empty instead of polling.')
+@click.option('--batch-size', type=int, default=None, help='Mails claimed per pass (OUTBOX_BATCH_SIZE).')
+@click.option('--interval', type=float, default=None, help='Seconds between polls when idle (OUTBOX_POLL_INTERVAL).')
+def work_command(once, batch_size, interval):
+    """Send pending mails, retrying failures with backoff."""
+    conn = get_db_connection()
+    if not conn:
+        raise click.ClickException('Could not connect to the database.')
+    worker = OutboxWorker(conn, batch_size)
+
+    def stop(signum, frame):
+        worker.stopping = True
+    signal.signal(signal.SIGTERM, stop)
+
+    try:
+        total = worker.run(once=once, interval=interval)
+    except KeyboardInterrupt:
+        total = None
+    finally:
+        conn.close()
+    if total is not None:
+        click.echo(f"Sent {total} mails.")
+
+
+@outbox_cli.command('smtp-stub')
+@click.option('--host', default='127.0.0.1', show_default=True)
+@click.option('--port', default=1025, show_default=True)
+@click.option('--maildir', type=click.Path(file_okay=False), default=None,
+              help='Where to write received mails (default: instance/mail).')
+def smtp_stub_command(host, port, maildir):
+    """Local SMTP server that stores every mail as a .eml file.
+
+    Point the app at it with MAIL_SERVER=127.0.0.1 MAIL_PORT=1025 MAIL_USE_SSL=false.
+    """
+    stub = SMTPStub(host, port, maildir or os.path.join(app.instance_path, 'mail'), logger=app.logger)
+    click.echo(f"SMTP stub listening on {host}:{stub.port}, writing to {stub.maildir}")
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub.server_close()
@@ -0,0 +1,284 @@
+"""Precomputed "similar businesses" for the public profile page.
+
+Two active businesses are similar when they share categories (Jaccard over
+category ids) and when their ``description`` + ``custom_categories`` text is
+alike (cosine similarity of TF-IDF vectors). The top ``RECOMMEND_TOP_N``
+neighbours of every active business are stored in ``business_neighbours``,
+so the profile reads them with one primary-key range scan.
+
+Vectors are sparse dicts and similarities are computed through inverted
+indexes (term -> businesses, category -> businesses), so scoring one business
+only touches the businesses it shares something with.
+
+Writes don't recompute anything: ``refresh_listing`` calls
+``queue_neighbours``, a single-row upsert into ``business_neighbours_queue``.
+``flask recommend work`` drains the queue in batches: it builds the corpus
+once per batch and recomputes the changed businesses and every business whose
+list the changes can affect. Run one worker; it is the only writer of
+``business_neighbours``, so request transactions never lock those rows.
+``flask recommend rebuild`` recomputes everything.
+"""
+import heapq
+import math
+import re
+import signal
+import time
+from collections import Counter, defaultdict
+
+import click
+from flask import current_app as app
+from flask.cli import AppGroup
+
+from config import Config
+from utils.db import get_db_connection
+
+CATEGORY_WEIGHT = 0.6
+TEXT_WEIGHT = 0.4
+
+STOPWORDS = frozenset("""
+    and the for with our you your are all any from that this have has was were will
+    can not but into out more most other some such than then them they their its
+    also get got very just only best good new we us who what when where how
+""".split())
+
+LOAD_CORPUS = """
+    SELECT b.id, b.description, b.custom_categories,
+           GROUP_CONCAT(bc.category_id) AS category_ids
+    FROM businesses b
+    LEFT JOIN business_categories bc ON b.id = bc.business_id
+    WHERE b.status = 'active'
+    GROUP BY b.id
+"""
+
+
+def _tokens(text):
+    return [t for t in re.findall(r'[a-z0-9]+', (text or '').lower()) if len(t) >= 3 and t not in STOPWORDS]
+
+
+class Corpus:
+    """TF-IDF vectors and category sets for a set of businesses."""
+
+    def __init__(self, docs):
+        # docs: id -> (text, set of category ids)
+        self.categories = {}
+        self.vectors = {}
+        self.by_category = defaultdict(set)
+        self.by_term = defaultdict(list)
+
+        term_counts = {}
+        df = Counter()
+        for business_id, (text, categories) in docs.items():
+            self.categories[business_id] = categories
+            for category_id in categories:
+                self.by_category[category_id].add(business_id)
+            counts = Counter(_tokens(text))
+            term_counts[business_id] = counts
+            df.update(counts.keys())
+
+        n = len(docs)
+        for business_id, counts in term_counts.items():
+            weights = {t: (1 + math.log(c)) * (math.log((1 + n) / (1 + df[t])) + 1) for t, c in counts.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            vector = {t: w / norm for t, w in weights.items()}
+            self.vectors[business_id] = vector
+            for term, weight in vector.items():
+                self.by_term[term].append((business_id, weight))
+
+    def __contains__(self, business_id):
+        return business_id in self.vectors
+
+    def scores(self, business_id):
+        """Similarity of ``business_id`` to every business it overlaps with."""
+        text = defaultdict(float)
+        for term, weight in self.vectors.get(business_id, {}).items():
+            for other, other_weight in self.by_term[term]:
+                text[other] += weight * other_weight
+
+        mine = self.categories.get(business_id, set())
+        shared = Counter()
+        for category_id in mine:
+            for other in self.by_category[category_id]:
+                shared[other] += 1
+
+        scores = {}
+        for other in set(text) | set(shared):
+            if other == business_id:
+                continue
+            union = len(mine | self.categories[other])
+            jaccard = shared[other] / union if union else 0.0
+            score = CATEGORY_WEIGHT * jaccard + TEXT_WEIGHT * min(text[other], 1.0)
+            if score > 0:
+                scores[other] = score
+        return scores
+
+    def top(self, business_id, n):
+        """[(neighbour_id, score)] best first; ties go to the older business."""
+        scores = self.scores(business_id)
+        return heapq.nlargest(n, scores.items(), key=lambda item: (item[1], -item[0]))
+
+
+def _load_corpus(cur):
+    cur.execute(LOAD_CORPUS)
+    rows = cur.fetchall()
+    docs = {}
+    for row in rows:
+        if not isinstance(row, dict):
+            row = dict(zip(cur.column_names, row))
+        categories = {int(c) for c in (row['category_ids'] or '').split(',') if c}
+        docs[row['id']] = (f"{row['description'] or ''} {row['custom_categories'] or ''}", categories)
+    return Corpus(docs)
+
+
+def _insert(cur, corpus, ids, top_n):
+    rows = [
+        (business_id, position, neighbour_id, round(score, 6))
+        for business_id in ids if business_id in corpus
+        for position, (neighbour_id, score) in enumerate(corpus.top(business_id, top_n), start=1)
+    ]
+    if rows:
+        cur.executemany("""
+            INSERT INTO business_neighbours (business_id, position, neighbour_id, score)
+            VALUES (%s, %s, %s, %s)
+        """, rows)
+
+
+def _replace(cur, corpus, business_ids, top_n):
+    ids = list(business_ids)
+    placeholders = ', '.join(['%s'] * len(ids))
+    cur.execute(f"DELETE FROM business_neighbours WHERE business_id IN ({placeholders})", ids)
+    _insert(cur, corpus, ids, top_n)
+
+
+def queue_neighbours(cur, business_id):
+    """Mark a business's neighbour lists stale. Runs in the caller's transaction."""
+    cur.execute("""
+        INSERT INTO business_neighbours_queue (business_id) VALUES (%s)
+        ON DUPLICATE KEY UPDATE requests = requests + 1
+    """, (business_id,))
+
+
+def refresh_neighbours(cur, business_ids, top_n=None):
+    """Recompute neighbour lists touched by changes to ``business_ids``.
+
+    Covers the businesses themselves, businesses that currently list one of
+    them, and businesses one of them now outranks (or whose list isn't full).
+    """
+    top_n = top_n or Config.RECOMMEND_TOP_N
+    changed = set(business_ids)
+    corpus = _load_corpus(cur)
+
+    cur.execute("""
+        SELECT business_id, COUNT(*) AS listed, MIN(score) AS floor
+        FROM business_neighbours
+        GROUP BY business_id
+    """)
+    current = {}
+    for row in cur.fetchall():
+        if not isinstance(row, dict):
+            row = dict(zip(cur.column_names, row))
+        current[row['business_id']] = row
+
+    affected = set(changed)
+    placeholders = ', '.join(['%s'] * len(changed))
+    cur.execute(f"""
+        SELECT DISTINCT business_id FROM business_neighbours WHERE neighbour_id IN ({placeholders})
+    """, list(changed))
+    for row in cur.fetchall():
+        affected.add(row['business_id'] if isinstance(row, dict) else row[0])
+    for business_id in changed:
+        if business_id not in corpus:
+            continue
+        for other, score in corpus.scores(business_id).items():
+            row = current.get(other)
+            if row is None or row['listed'] < top_n or score > float(row['floor']):
+                affected.add(other)
+    _replace(cur, corpus, affected, top_n)
+    return len(affected)
+
+
+def refresh_queued(conn, batch_size=None):
+    """Recompute one batch from the queue and commit; returns how many businesses were queued."""
+    cur = conn.cursor(dictionary=True)
+    cur.execute("""
+        SELECT business_id, requests FROM business_neighbours_queue
+        ORDER BY queued_at
+        LIMIT %s
+    """, (batch_size or app.config['RECOMMEND_BATCH_SIZE'],))
+    queued = cur.fetchall()
+    if not queued:
+        conn.commit()
+        return 0
+    refresh_neighbours(cur, [row['business_id'] for row in queued])
+    # Rows queued again while we worked keep their higher count and stay
+    cur.executemany(
+        "DELETE FROM business_neighbours_queue WHERE business_id = %s AND requests = %s",
+        [(row['business_id'], row['requests']) for row in queued],
+    )
+    conn.commit()
+    return len(queued)
+
+
+def rebuild_all(cur, top_n=None):
+    """Recompute every active business's neighbours; returns how many."""
+    top_n = top_n or Config.RECOMMEND_TOP_N
+    corpus = _load_corpus(cur)
+    cur.execute("DELETE FROM business_neighbours")
+    cur.execute("DELETE FROM business_neighbours_queue")
+    _insert(cur, corpus, list(corpus.vectors), top_n)
+    return len(corpus.vectors)
+
+
+recommend_cli = AppGroup('recommend', help='Maintain the similar-business recommendations.')
+
+
+@recommend_cli.command('rebuild')
+def rebuild_command():
+    """Recompute all neighbour lists from the source tables."""
+    conn = get_db_connection()
+    if not conn:
+        raise click.ClickException('Could not connect to the database.')
+    try:
+        cur = conn.cursor(dictionary=True)
+        count = rebuild_all(cur)
+        conn.commit()
+        click.echo(f"Rebuilt neighbours for {count} businesses.")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+@recommend_cli.command('work')
+@click.option('--once', is_flag=True, help='Exit when the queue is empty instead of polling.')
+@click.option('--batch-size', type=int, default=None, help='Queued businesses per pass (RECOMMEND_BATCH_SIZE).')
+@click.option('--interval', type=float, default=None, help='Seconds between polls when idle (RECOMMEND_POLL_INTERVAL).')
+def work_command(once, batch_size, interval):
+    """Recompute the neighbour lists of businesses changed since the last pass."""
+    interval = interval or app.config['RECOMMEND_POLL_INTERVAL']
+    conn = get_db_connection()
+    if not conn:
+        raise click.ClickException('Could not connect to the database.')
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+
+    total = 0
+    try:
+        while not stopping:
+            conn.ping(reconnect=True)
+            try:
+                done = refresh_queued(conn, batch_size)
+            except Exception:
+                conn.rollback()
+                raise
+            total += done
+            if done:
+                continue
+            if once:
+                break
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        conn.close()
+    click.echo(f"Refreshed neighbours for {total} changed businesses.")
@@ -1,4 +1,8 @@
-from flask import g, request, url_for
+from flask import current_app, g, request, url_for
+from jinja2.utils import htmlsafe_json_dumps
+
+from config import Config
+from utils.cache import LRUCache
 
 DEFAULTS = {
     "site_name": "Ajah Businenesses",
@@ -7,6 +11,9 @@ DEFAULTS = {
     "twitter_handle": "@ssalesnet",
 }
 
+# Built SEO payloads, keyed by the caller's version key (see cached_seo)
+seo_cache = LRUCache(max_entries=Config.SEO_CACHE_MAX_ENTRIES, ttl=Config.SEO_CACHE_TTL)
+
 
 def build_seo(
     *,
@@ -33,7 +40,24 @@ def build_seo(
         "image": image or default_image,
         "canonical": canonical or request.url,
         "schema": schema,
+        # Serialized once here so seo_head.html just emits the string
+        "schema_json": htmlsafe_json_dumps(schema, dumps=current_app.json.dumps) if schema else None,
         "noindex": noindex,
         "site_name": DEFAULTS["site_name"],
         "twitter_handle": DEFAULTS["twitter_handle"],
     }
+
+
+def cached_seo(key, build):
+    """Return ``build()`` (a build_seo payload), memoized per ``key``.
+
+    ``key`` must change whenever the page's content does (e.g. a listing
+    version). The request URL is added to it because the payload holds
+    absolute URLs and the canonical link.
+    """
+    full_key = (request.url, *key)
+    seo = seo_cache.get(full_key)
+    if seo is None:
+        seo = build()
+        seo_cache.set(full_key, seo)
+    return seo
@@ -0,0 +1,227 @@
+"""sitemap.xml generation with an on-disk cache.
+
+``/sitemap.xml`` is an index pointing at one categories sitemap and at
+business sitemaps chunked by id range (``SITEMAP_CHUNK_SIZE`` ids per file),
+so a change to one business only invalidates the file holding its id range.
+Files are written on first request from an unbuffered (server-side) cursor,
+streamed row by row into a temp file and renamed into place, so no chunk is
+held in memory and readers never see a half-written file.
+
+``refresh_listing`` and ``invalidate_reference_data`` call
+``invalidate_business_sitemap`` / ``invalidate_category_sitemap``. Like the
+page cache, invalidation bumps a generation stamp (``<name>.stamp``, or
+``all.stamp`` for everything), and inside a request only at teardown, after
+the write has committed. A generated file takes the time its generation
+started as its mtime and is only served while that is newer than its
+stamps, so a regeneration that raced a write is redone on the next request.
+
+Business chunks past the highest id are 404s, so only real chunks are ever
+written to disk.
+"""
+import os
+import tempfile
+import time
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+
+from flask import current_app as app, g, has_request_context, url_for
+
+from utils.db import get_db_connection
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+INDEX_FILE = 'index.xml'
+CATEGORIES_FILE = 'categories.xml'
+ALL_STAMP = 'all'
+
+
+def _cache_dir():
+    directory = app.config.get('SITEMAP_CACHE_DIR') or os.path.join(app.instance_path, 'sitemaps')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def _chunk_size():
+    return app.config['SITEMAP_CHUNK_SIZE']
+
+
+def business_chunk_file(chunk):
+    return f'businesses-{chunk}.xml'
+
+
+def _lastmod(value):
+    return value.strftime('%Y-%m-%d') if value else None
+
+
+def _url_entry(loc, lastmod=None, tag='url'):
+    parts = [f'<{tag}><loc>{escape(loc)}</loc>']
+    if lastmod:
+        parts.append(f'<lastmod>{lastmod}</lastmod>')
+    parts.append(f'</{tag}>\n')
+    return ''.join(parts)
+
+
+def _url_template(endpoint, **placeholder):
+    """url_for once with a placeholder, then format per row (thousands of rows)."""
+    (arg, marker), = placeholder.items()
+    return url_for(endpoint, _external=True, **{arg: marker}).replace(marker, '{}')
+
+
+def _write_atomic(name, lines, generation):
+    directory = _cache_dir()
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            for line in lines:
+                f.write(line)
+        os.utime(tmp_path, ns=(generation, generation))
+        os.replace(tmp_path, os.path.join(directory, name))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return os.path.join(directory, name)
+
+
+def _stream(sql, params=()):
+    """Yield rows from an unbuffered cursor on the request connection."""
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError('No database connection')
+    cur = conn.cursor(buffered=False)
+    try:
+        cur.execute(sql, params)
+        yield from cur
+    finally:
+        cur.close()
+
+
+def _generate_index():
+    size = _chunk_size()
+    yield XML_HEADER
+    yield f'<sitemapindex xmlns="{SITEMAP_NS}">\n'
+    yield _url_entry(url_for('sitemap.categories_sitemap', _external=True), tag='sitemap')
+    for chunk, updated_at in _stream("""
+        SELECT (id - 1) DIV %s AS chunk, MAX(updated_at)
+        FROM business_listing
+        WHERE status = 'active' AND slug IS NOT NULL
+        GROUP BY chunk
+        ORDER BY chunk
+    """, (size,)):
+        loc = url_for('sitemap.business_sitemap', chunk=chunk, _external=True)
+        yield _url_entry(loc, _lastmod(updated_at), tag='sitemap')
+    yield '</sitemapindex>\n'
+
+
+def _generate_categories():
+    template = _url_template('categories.businesses_by_category', category_slug='__slug__')
+    yield XML_HEADER
+    yield f'<urlset xmlns="{SITEMAP_NS}">\n'
+    for slug, updated_at in _stream("""
+        SELECT c.slug, MAX(bl.updated_at)
+        FROM categories c
+        LEFT JOIN business_listing_category blc ON blc.category_id = c.id AND blc.status = 'active'
+        LEFT JOIN business_listing bl ON bl.id = blc.business_id
+        WHERE c.slug IS NOT NULL AND c.slug != ''
+        GROUP BY c.id, c.slug
+        ORDER BY c.id
+    """):
+        yield _url_entry(template.format(quote(slug)), _lastmod(updated_at))
+    yield '</urlset>\n'
+
+
+def _generate_businesses(chunk):
+    size = _chunk_size()
+    template = _url_template('business.public_business_profile', business_slug='__slug__')
+    yield XML_HEADER
+    yield f'<urlset xmlns="{SITEMAP_NS}">\n'
+    for slug, updated_at in _stream("""
+        SELECT slug, updated_at
+        FROM business_listing
+        WHERE id BETWEEN %s AND %s
+          AND status = 'active' AND slug IS NOT NULL
+        ORDER BY id
+    """, (chunk * size + 1, (chunk + 1) * size)):
+        yield _url_entry(template.format(quote(slug)), _lastmod(updated_at))
+    yield '</urlset>\n'
+
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def _stamp_path(name):
+    return os.path.join(_cache_dir(), f'{name}.stamp')
+
+
+def _fresh(path, name):
+    built = _mtime_ns(path)
+    return built > max(_mtime_ns(_stamp_path(name)), _mtime_ns(_stamp_path(ALL_STAMP)))
+
+
+def _cached(name, generate):
+    path = os.path.join(_cache_dir(), name)
+    if _fresh(path, name):
+        return path
+    # Taken before the queries run: a write committed after this point
+    # bumps a stamp past it, and the file is regenerated
+    generation = time.time_ns()
+    return _write_atomic(name, generate(), generation)
+
+
+def sitemap_index_path():
+    return _cached(INDEX_FILE, _generate_index)
+
+
+def categories_sitemap_path():
+    return _cached(CATEGORIES_FILE, _generate_categories)
+
+
+def _last_chunk():
+    (max_id,), = list(_stream("SELECT MAX(id) FROM business_listing"))
+    return (max_id - 1) // _chunk_size() if max_id else -1
+
+
+def business_sitemap_path(chunk):
+    """Path of a business chunk's sitemap, or None for a chunk past the highest id."""
+    if chunk > _last_chunk():
+        return None
+    return _cached(business_chunk_file(chunk), lambda: _generate_businesses(chunk))
+
+
+def _bump(names):
+    now = time.time_ns()
+    for name in names:
+        path = _stamp_path(name)
+        with open(path, 'a'):
+            os.utime(path, ns=(now, now))
+
+
+def _invalidate(*names):
+    if has_request_context():
+        g.setdefault('stale_sitemaps', set()).update(names)
+    else:
+        _bump(names)
+
+
+def invalidate_business_sitemap(business_id):
+    """Mark the chunk holding ``business_id`` (and the index) for regeneration."""
+    _invalidate(INDEX_FILE, business_chunk_file((business_id - 1) // _chunk_size()))
+
+
+def invalidate_category_sitemap():
+    _invalidate(INDEX_FILE, CATEGORIES_FILE)
+
+
+def invalidate_sitemaps():
+    """Regenerate every sitemap file (after bulk rebuilds)."""
+    _bump([ALL_STAMP])
+
+
+def flush_sitemap_invalidation(exc=None):
+    """Teardown hook: bump the stamps of the files marked stale during the request."""
+    names = g.pop('stale_sitemaps', None)
+    if names:
+        _bump(names)
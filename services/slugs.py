@@ -0,0 +1,150 @@
+"""Slug -> business resolution for ``/business/<slug>``.
+
+``resolve_slug`` answers from a per-worker LRU of slug -> ``SlugTarget``:
+the business id, status and listing version, or the slug to 301 to when the
+business was renamed. Unknown slugs are cached too (as ``None``), so bots
+retrying dead or mistyped URLs don't reach MySQL after the first miss. On a
+miss it does one indexed lookup on ``business_listing.slug``, then one on
+``business_slug_redirects``.
+
+``refresh_listing`` clears this worker's cache; other workers pick up
+changes within ``SLUG_CACHE_TTL`` seconds.
+
+``flask slugs backfill`` assigns slugs to businesses that never got one.
+"""
+import re
+from collections import namedtuple
+
+import click
+from flask.cli import AppGroup
+
+from config import Config
+from utils.cache import LRUCache
+from utils.db import get_db_connection
+from utils.page_cache import invalidate_pages
+from utils.slug import allocate_slug, slugify
+
+SlugTarget = namedtuple('SlugTarget', 'business_id status version redirect_to')
+
+_MISSING = object()
+
+slug_cache = LRUCache(max_entries=Config.SLUG_CACHE_MAX_ENTRIES, ttl=Config.SLUG_CACHE_TTL)
+
+
+def _lookup(cur, slug):
+    cur.execute("SELECT id, status, version FROM business_listing WHERE slug = %s", (slug,))
+    row = cur.fetchone()
+    if row:
+        if not isinstance(row, dict):
+            row = dict(zip(('id', 'status', 'version'), row))
+        return SlugTarget(row['id'], row['status'], row['version'], None)
+
+    cur.execute("""
+        SELECT bl.slug
+        FROM business_slug_redirects r
+        JOIN business_listing bl ON bl.id = r.business_id
+        WHERE r.old_slug = %s
+    """, (slug,))
+    row = cur.fetchone()
+    if row:
+        current = row['slug'] if isinstance(row, dict) else row[0]
+        if current and current != slug:
+            return SlugTarget(None, None, None, current)
+    return None
+
+
+def resolve_slug(cur, slug):
+    """``SlugTarget`` for ``slug``, or None when no business has (or had) it."""
+    target = slug_cache.get(slug, _MISSING)
+    if target is _MISSING:
+        target = _lookup(cur, slug)
+        slug_cache.set(slug, target)
+    return target
+
+
+def invalidate_slugs(*slugs):
+    """Drop cached resolutions (all of them when called without arguments)."""
+    slug_cache.invalidate(*slugs)
+
+
+def rename_business_slug(cur, business_id, business_name):
+    """Give a renamed business a slug matching its new name.
+
+    The old slug is kept in ``business_slug_redirects`` so existing links
+    301 to the new one. Call before ``refresh_listing``; returns the new slug.
+    """
+    cur.execute("SELECT slug FROM businesses WHERE id = %s", (business_id,))
+    row = cur.fetchone()
+    old_slug = (row['slug'] if isinstance(row, dict) else row[0]) if row else None
+
+    base_slug = slugify(business_name or "")
+    if not base_slug or (old_slug and re.fullmatch(rf"{re.escape(base_slug)}(-\d+)?", old_slug)):
+        return old_slug  # name change doesn't affect the slug
+
+    new_slug = allocate_slug(
+        cur, base_slug,
+        lambda slug: cur.execute("UPDATE businesses SET slug = %s WHERE id = %s", (slug, business_id)),
+    )
+    if old_slug:
+        cur.execute("""
+            INSERT INTO business_slug_redirects (old_slug, business_id) VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE business_id = VALUES(business_id)
+        """, (old_slug, business_id))
+    # A live slug always wins over a redirect
+    cur.execute("DELETE FROM business_slug_redirects WHERE old_slug = %s", (new_slug,))
+    invalidate_slugs(old_slug, new_slug)
+    return new_slug
+
+
+slugs_cli = AppGroup('slugs', help='Maintain business slugs.')
+
+
+@slugs_cli.command('backfill')
+@click.option('--batch-size', default=500, show_default=True, help='Businesses per transaction.')
+def backfill_command(batch_size):
+    """Assign slugs to businesses that have none, committing per batch."""
+    conn = get_db_connection()
+    if not conn:
+        raise click.ClickException('Could not connect to the database.')
+    total = 0
+    try:
+        cur = conn.cursor(dictionary=True)
+        while True:
+            cur.execute("""
+                SELECT id, business_name FROM businesses
+                WHERE slug IS NULL OR slug = ''
+                ORDER BY id
+                LIMIT %s
+            """, (batch_size,))
+            batch = cur.fetchall()
+            if not batch:
+                break
+
+            for row in batch:
+                allocate_slug(
+                    cur, slugify(row['business_name'] or ''),
+                    lambda slug: cur.execute("UPDATE businesses SET slug = %s WHERE id = %s", (slug, row['id'])),
+                )
+            # Copy just the slugs into the read model; a full refresh_listing per
+            # row would also rerun the recommender
+            ids = [row['id'] for row in batch]
+            placeholders = ', '.join(['%s'] * len(ids))
+            cur.execute(f"""
+                UPDATE business_listing bl
+                JOIN businesses b ON b.id = bl.id
+                SET bl.slug = b.slug, bl.version = bl.version + 1
+                WHERE bl.id IN ({placeholders})
+            """, ids)
+            conn.commit()
+            total += len(batch)
+            click.echo(f"Assigned {total} slugs...")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    invalidate_slugs()
+    if total:
+        invalidate_pages()
+    click.echo(f"Done: {total} businesses got a slug.")
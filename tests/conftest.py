@@ -0,0 +1,4 @@
+import os
+
+# utils.helpers builds its itsdangerous serializer from the environment at import
+os.environ.setdefault('SECRET_KEY', 'test-secret-key')
@@ -0,0 +1,96 @@
+"""Streaming export (services.export) when the consumer stops early.
+
+``FakeConnection`` behaves like mysql-connector's unbuffered cursors: rows
+are read one at a time, and closing the cursor with rows still unread raises
+``InternalError("Unread result found")``.
+"""
+import json
+from datetime import datetime
+
+import pytest
+from mysql.connector import errors
+
+from services.export import EXPORT_COLUMNS, export_lines, export_rows
+
+
+def business(n):
+    row = dict.fromkeys(EXPORT_COLUMNS)
+    row.update(id=n, business_name=f"Business {n}", is_subscribed=0, categories='Food\x1fHair, Beauty',
+               created_at=datetime(2024, 1, 1), updated_at=datetime(2024, 1, n))
+    return tuple(row[column] for column in EXPORT_COLUMNS)
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.read = 0
+
+    def execute(self, operation, params=None):
+        pass
+
+    def __iter__(self):
+        while self.read < len(self.rows):
+            self.read += 1
+            yield self.rows[self.read - 1]
+
+    def close(self):
+        if self.read < len(self.rows):
+            raise errors.InternalError('Unread result found')
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.cur = FakeCursor(rows)
+        self.was_shut_down = self.closed = False
+
+    def cursor(self, buffered=None):
+        return self.cur
+
+    def shutdown(self):
+        self.was_shut_down = True
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def conn():
+    return FakeConnection([business(n) for n in range(1, 6)])
+
+
+def test_complete_export_closes_cursor(conn):
+    rows = list(export_rows(conn))
+
+    assert [row['id'] for row in rows] == [1, 2, 3, 4, 5]
+    assert rows[0]['categories'] == ['Food', 'Hair, Beauty']
+    assert rows[0]['is_subscribed'] is False
+    assert not conn.was_shut_down
+
+
+def test_complete_export_lines_close_connection(conn):
+    lines = list(export_lines(conn, 'csv'))
+
+    assert len(lines) == 6
+    assert conn.closed and not conn.was_shut_down
+
+
+def test_abandoned_export_drops_connection(conn):
+    lines = export_lines(conn, 'ndjson')
+    first = next(lines)
+    next(lines)
+
+    lines.close()  # client disconnected
+
+    assert json.loads(first)['id'] == 1
+    assert conn.cur.read == 2  # the rest is never read off the wire
+    assert conn.was_shut_down and conn.closed
+
+
+def test_export_abandoned_before_first_row_closes_connection(conn):
+    lines = export_lines(conn, 'csv')
+    assert next(lines).startswith('id,business_name,')
+
+    lines.close()
+
+    assert conn.cur.read == 0  # the query never ran
+    assert conn.closed
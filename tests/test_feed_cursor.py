@@ -0,0 +1,113 @@
+"""Home feed keyset pagination (routes.index).
+
+The cursor predicate and ordering run against an in-memory SQLite copy of the
+columns they use, with many rows sharing ``created_at`` so only the id
+tie-breaker separates them.
+"""
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+
+from routes import index
+from routes.index import PER_PAGE, _cursor_key, _decode_position, _feed_query
+from utils.helpers import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    key = [1, 0, '2024-05-01T10:00:00', 42]
+
+    assert decode_cursor(encode_cursor(key)) == key
+    assert _decode_position(encode_cursor(key)) == (1, 0, datetime(2024, 5, 1, 10), 42)
+
+
+@pytest.mark.parametrize('token', [
+    'not-a-token',
+    encode_cursor([1, 0, '2024-05-01T10:00:00', 42])[:-2] + 'xx',  # bad signature
+    encode_cursor([1, 0, '2024-05-01T10:00:00']),                  # 3 elements
+    encode_cursor([1, 0, '2024-05-01T10:00:00', 42, 7]),
+    encode_cursor({'id': 42}),
+    encode_cursor('42'),
+    encode_cursor([1, 0, 'yesterday', 42]),
+    encode_cursor([1, 0, 1714557600, 42]),
+    encode_cursor(['1', 0, '2024-05-01T10:00:00', 42]),
+    encode_cursor([True, 0, '2024-05-01T10:00:00', 42]),
+    encode_cursor([1, 0, '2024-05-01T10:00:00', None]),
+])
+def test_malformed_cursors_are_rejected(token):
+    assert _decode_position(token) is None
+
+
+@pytest.mark.parametrize('param', ['after', 'before'])
+def test_malformed_cursor_falls_back_to_first_page(param):
+    app = Flask(__name__)
+    app.register_blueprint(index.bp)
+
+    response = app.test_client().get('/', query_string={param: encode_cursor([1, 0, '2024-05-01T10:00:00'])})
+
+    assert response.status_code == 302
+    assert response.headers['Location'] == '/'
+
+
+@pytest.fixture
+def db():
+    conn = sqlite3.connect(':memory:', detect_types=sqlite3.PARSE_DECLTYPES)
+    conn.row_factory = sqlite3.Row
+    conn.execute("""
+        CREATE TABLE business_listing (
+            id INTEGER PRIMARY KEY, is_subscribed INTEGER, status_rank INTEGER,
+            created_at TIMESTAMP, status TEXT
+        )
+    """)
+    noon = datetime(2024, 5, 1, 12)
+    rows = []
+    for n in range(1, 61):
+        # Three timestamps shared by 20 rows each, across every band
+        created_at = noon - timedelta(hours=n % 3)
+        rows.append((n, int(n % 4 == 0), int(n % 5 == 0), created_at, 'deleted' if n % 11 == 0 else 'active'))
+    conn.executemany("INSERT INTO business_listing VALUES (?, ?, ?, ?, ?)", rows)
+    yield conn
+    conn.close()
+
+
+def expected_order(db):
+    rows = [dict(row) for row in db.execute("SELECT * FROM business_listing WHERE status != 'deleted'")]
+    rows.sort(key=lambda r: (-r['is_subscribed'], r['status_rank'], -r['created_at'].timestamp(), -r['id']))
+    return [row['id'] for row in rows]
+
+
+def page(db, token=None, backward=False):
+    """One page the way home() builds it: ids, has_more, and the edge cursors."""
+    position = _decode_position(token) if token else None
+    sql, params = _feed_query(position, backward and bool(position))
+    rows = [dict(row) for row in db.execute(sql.replace('%s', '?'), params)]
+    has_more = len(rows) > PER_PAGE
+    rows = rows[:PER_PAGE]
+    if backward:
+        rows.reverse()
+    return [r['id'] for r in rows], has_more, encode_cursor(_cursor_key(rows[0])), encode_cursor(_cursor_key(rows[-1]))
+
+
+def test_forward_and_back_cover_every_row_once(db):
+    expected = expected_order(db)
+    assert len(expected) > 3 * PER_PAGE
+
+    pages, token = [], None
+    while True:
+        ids, has_more, first, last = page(db, token)
+        pages.append((ids, first))
+        if not has_more:
+            break
+        token = last
+    assert [i for ids, _ in pages for i in ids] == expected
+
+    # Walk back from the last page with each page's first row as ?before=
+    back = []
+    token = pages[-1][1]
+    for _ in range(len(pages) - 1):
+        ids, has_more, first, _last = page(db, token, backward=True)
+        back.append(ids)
+        token = first
+    assert back == [ids for ids, _ in reversed(pages[:-1])]
+    assert has_more is False  # reached the first page
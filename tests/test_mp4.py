@@ -0,0 +1,274 @@
+"""faststart and probe (utils.mp4) on small hand-built MP4 files.
+
+Each test file carries a distinct marker at every chunk offset listed in its
+``stco``/``co64`` tables, so after faststart every offset must still land on
+the same marker. The co64 test needs offsets past 4 GiB; ``SparseFile``
+serves that file without holding it in memory.
+"""
+import bisect
+import hashlib
+import io
+import os
+import struct
+
+import pytest
+
+from utils import mp4
+
+IDENTITY = (0x10000, 0, 0, 0, 0x10000, 0, 0, 0, 0x40000000)
+ROTATE_90 = (0, 0x10000, 0, -0x10000, 0, 0, 0, 0, 0x40000000)
+
+
+def atom(kind, payload):
+    return struct.pack('>I4s', len(payload) + 8, kind) + payload
+
+
+def full_atom(kind, version, body):
+    return atom(kind, bytes([version, 0, 0, 0]) + body)
+
+
+def mvhd(version, timescale, duration):
+    times = struct.pack('>QQIQ' if version else '>IIII', 0, 0, timescale, duration)
+    return full_atom(b'mvhd', version, times + bytes(80))
+
+
+def tkhd(version, width, height, matrix=IDENTITY):
+    times = struct.pack('>QQIIQ' if version else '>IIIII', 0, 0, 1, 0, 0)
+    size = struct.pack('>II', width << 16, height << 16)
+    return full_atom(b'tkhd', version, times + bytes(16) + struct.pack('>9i', *matrix) + size)
+
+
+def chunk_offsets(offsets, kind=b'stco'):
+    fmt = '>Q' if kind == b'co64' else '>I'
+    return full_atom(kind, 0, struct.pack('>I', len(offsets)) + b''.join(struct.pack(fmt, o) for o in offsets))
+
+
+def trak(offsets, kind=b'stco', handler=b'vide', header=None):
+    hdlr = full_atom(b'hdlr', 0, bytes(4) + handler + bytes(12) + b'\0')
+    stbl = atom(b'stbl', chunk_offsets(offsets, kind))
+    mdia = atom(b'mdia', hdlr + atom(b'minf', stbl))
+    return atom(b'trak', (header or tkhd(0, 640, 360)) + mdia)
+
+
+def moov(*traks, header=None):
+    return atom(b'moov', (header or mvhd(0, 1000, 5000)) + b''.join(traks))
+
+
+FTYP = atom(b'ftyp', b'isom' + bytes(4) + b'isommp42')
+
+
+def marker(n):
+    return f"<chunk {n:04d}>".encode()
+
+
+def mdat_with_markers(start, count):
+    """An mdat at ``start`` with ``count`` markers; returns (atom, {offset: marker})."""
+    payload = b''
+    markers = {}
+    for n in range(count):
+        offset = start + 8 + len(payload)
+        markers[offset] = marker(start + n)
+        payload += markers[offset] + b'media' * 3
+    return atom(b'mdat', payload), markers
+
+
+def top_level(data):
+    return [kind for kind, _offset, _size in mp4._top_level_atoms(io.BytesIO(data))]
+
+
+def offset_tables(moov_atom):
+    """[(kind, [offsets])] for every stco/co64 in a moov atom."""
+    tables = []
+
+    def walk(kind, payload):
+        if kind in mp4.CONTAINERS:
+            for child in mp4._children(payload):
+                walk(*child)
+        elif kind in (b'stco', b'co64'):
+            tables.append((kind, list(mp4._offsets(kind, payload)[1])))
+
+    walk(b'moov', moov_atom[8:])
+    return tables
+
+
+def read_moov(read, atoms):
+    _kind, offset, size = next(a for a in atoms if a[0] == b'moov')
+    return read(offset, size)
+
+
+def faststart_bytes(data):
+    out = io.BytesIO()
+    assert mp4.faststart(io.BytesIO(data), out.write) is True
+    return out.getvalue()
+
+
+def assert_offsets_point_at(read, tables, markers):
+    found = [offset for _kind, offsets in tables for offset in offsets]
+    assert len(found) == len(markers)
+    assert [read(offset, len(m)) for offset, m in zip(found, markers)] == markers
+
+
+def test_moov_moves_ahead_of_mdat():
+    mdat, markers = mdat_with_markers(len(FTYP), 4)
+    offsets = sorted(markers)
+    data = FTYP + mdat + moov(trak(offsets[:2]), trak(offsets[2:], handler=b'soun'))
+
+    out = faststart_bytes(data)
+
+    assert top_level(data) == [b'ftyp', b'mdat', b'moov']
+    assert top_level(out) == [b'ftyp', b'moov', b'mdat']
+    assert len(out) == len(data)
+    tables = offset_tables(read_moov(lambda o, n: out[o:o + n], mp4._top_level_atoms(io.BytesIO(out))))
+    assert [kind for kind, _ in tables] == [b'stco', b'stco']
+    assert_offsets_point_at(lambda o, n: out[o:o + n], tables, [markers[o] for o in offsets])
+
+
+def test_media_after_moov_keeps_its_offsets_valid():
+    first, first_markers = mdat_with_markers(len(FTYP), 2)
+    moov_size = len(moov(trak([0] * 4)))  # offsets don't change its size
+    second, second_markers = mdat_with_markers(len(FTYP) + len(first) + moov_size, 2)
+    markers = {**first_markers, **second_markers}
+    offsets = sorted(markers)
+    data = FTYP + first + moov(trak(offsets)) + second
+
+    out = faststart_bytes(data)
+
+    assert top_level(out) == [b'ftyp', b'moov', b'mdat', b'mdat']
+    tables = offset_tables(read_moov(lambda o, n: out[o:o + n], mp4._top_level_atoms(io.BytesIO(out))))
+    assert_offsets_point_at(lambda o, n: out[o:o + n], tables, [markers[o] for o in offsets])
+
+
+def test_already_faststart_is_left_alone():
+    mdat, markers = mdat_with_markers(0, 1)
+    data = FTYP + moov(trak(list(markers))) + mdat
+    writes = []
+
+    assert mp4.faststart(io.BytesIO(data), writes.append) is False
+    assert writes == []
+
+
+def test_missing_moov_is_rejected():
+    with pytest.raises(ValueError):
+        mp4.faststart(io.BytesIO(FTYP + atom(b'mdat', b'x' * 16)), lambda chunk: None)
+
+
+def test_faststart_file_rewrites_in_place(tmp_path):
+    mdat, markers = mdat_with_markers(len(FTYP), 2)
+    path = tmp_path / 'clip.mp4'
+    path.write_bytes(FTYP + mdat + moov(trak(sorted(markers))))
+
+    digest = mp4.faststart_file(str(path))
+
+    assert top_level(path.read_bytes()) == [b'ftyp', b'moov', b'mdat']
+    assert digest == hashlib.sha256(path.read_bytes()).hexdigest()
+    assert mp4.faststart_file(str(path)) is None
+    assert os.listdir(tmp_path) == ['clip.mp4']
+
+
+class SparseFile:
+    """Read-only file of ``size`` zero bytes with ``data`` ({offset: bytes}) laid over it."""
+
+    def __init__(self, size, data):
+        self.size = size
+        self.data = sorted(data.items())
+        self.position = 0
+        self.zeros = memoryview(bytes(mp4.CHUNK_SIZE))
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        self.position = {os.SEEK_SET: 0, os.SEEK_CUR: self.position, os.SEEK_END: self.size}[whence] + offset
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def read(self, n=-1):
+        start = self.position
+        end = self.size if n < 0 else min(self.size, start + n)
+        self.position = end
+        pieces = [(o, d) for o, d in self.data if o < end and o + len(d) > start]
+        if not pieces and end - start <= len(self.zeros):
+            return self.zeros[:end - start]
+        buffer = bytearray(end - start)
+        for offset, data in pieces:
+            lo, hi = max(offset, start), min(offset + len(data), end)
+            buffer[lo - start:hi - start] = data[lo - offset:hi - offset]
+        return bytes(buffer)
+
+
+class Sink:
+    """Collects faststart's output; ``read`` looks bytes up by position."""
+
+    def __init__(self):
+        self.starts = []
+        self.chunks = []
+        self.size = 0
+
+    def write(self, chunk):
+        self.starts.append(self.size)
+        self.chunks.append(chunk)
+        self.size += len(chunk)
+
+    def read(self, offset, n):
+        out = b''
+        index = bisect.bisect_right(self.starts, offset) - 1
+        while len(out) < n:
+            chunk = self.chunks[index]
+            out += bytes(chunk[offset + len(out) - self.starts[index]:][:n - len(out)])
+            index += 1
+        return out
+
+    def as_file(self):
+        # SparseFile hands out views of its zero buffer; everything else is data
+        return SparseFile(self.size, {start: bytes(chunk) for start, chunk in zip(self.starts, self.chunks)
+                                      if not isinstance(chunk, memoryview)})
+
+
+def test_offsets_past_4gib_switch_to_co64(monkeypatch):
+    monkeypatch.setattr(mp4, 'CHUNK_SIZE', 64 * 1024 * 1024)
+    mdat_start = len(FTYP)
+    moov_start = 0x100000000  # the mdat (64-bit size) ends exactly at 4 GiB
+    first, last = mdat_start + 16, moov_start - 16
+
+    def build(after):
+        index = moov(trak([first, last]), trak([after], kind=b'co64', handler=b'soun'))
+        return index, moov_start + len(index) + 8
+
+    index, after = build(0)
+    index, after = build(after)  # the trailing mdat's offset, now that moov's size is known
+    markers = {first: marker(1), last: marker(2), after: marker(3)}
+    size = after + 16
+    data = {0: FTYP, mdat_start: struct.pack('>I4sQ', 1, b'mdat', moov_start - mdat_start),
+            moov_start: index, after - 8: struct.pack('>I4s', 24, b'mdat'), **markers}
+    sink = Sink()
+
+    assert mp4.faststart(SparseFile(size, data), sink.write) is True
+
+    out_atoms = mp4._top_level_atoms(sink.as_file())
+    assert [kind for kind, _o, _s in out_atoms] == [b'ftyp', b'moov', b'mdat', b'mdat']
+    tables = offset_tables(read_moov(sink.read, out_atoms))
+    assert [kind for kind, _ in tables] == [b'co64', b'co64']
+    assert sink.size == size + 8  # two stco entries grew from 4 to 8 bytes
+    assert_offsets_point_at(sink.read, tables, [markers[first], markers[last], markers[after]])
+    assert tables[0][1][1] > 0xFFFFFFFF
+
+
+@pytest.mark.parametrize('version', [0, 1])
+def test_probe_reads_duration_and_size(version):
+    mdat, markers = mdat_with_markers(0, 1)
+    data = FTYP + moov(trak(list(markers), header=tkhd(version, 1280, 720)),
+                       header=mvhd(version, 600, 7488)) + mdat
+
+    assert mp4.probe(io.BytesIO(data)) == {'duration': 12.48, 'width': 1280, 'height': 720}
+
+
+def test_probe_swaps_size_for_rotated_video():
+    data = FTYP + moov(trak([0], header=tkhd(0, 1920, 1080, ROTATE_90)))
+
+    assert mp4.probe(io.BytesIO(data)) == {'duration': 5.0, 'width': 1080, 'height': 1920}
+
+
+def test_probe_ignores_audio_tracks_and_missing_moov():
+    audio_only = FTYP + moov(trak([0], handler=b'soun'))
+
+    assert mp4.probe(io.BytesIO(audio_only)) == {'duration': 5.0}
+    assert mp4.probe(io.BytesIO(FTYP + atom(b'mdat', b''))) == {}
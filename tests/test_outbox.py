@@ -0,0 +1,104 @@
+"""Outbox delivery against the local SMTP stub (utils.smtp_stub).
+
+The SMTP tests need nothing else. The end-to-end test (enqueue -> worker ->
+stub) also needs the MySQL server configured by DB_HOST/DB_NAME/DB_USER/
+DB_PASSWORD and is skipped without one; it works on a temporary
+``email_outbox`` table, so the real queue is never touched.
+"""
+import pytest
+from flask import Flask
+from flask_mail import Mail, Message
+
+from config import config
+from services.outbox import OutboxWorker, SMTPSession, enqueue_email
+from utils.db import get_db_connection
+from utils.smtp_stub import SMTPStub
+
+# Same columns as migrations/versions/0009_email_outbox.py
+OUTBOX_TABLE = """
+    CREATE TEMPORARY TABLE email_outbox (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        kind VARCHAR(32) NOT NULL,
+        recipient VARCHAR(255) NOT NULL,
+        sender VARCHAR(255) NOT NULL,
+        subject VARCHAR(255) NOT NULL,
+        html_body TEXT NOT NULL,
+        status VARCHAR(10) NOT NULL DEFAULT 'pending',
+        attempts INT NOT NULL DEFAULT 0,
+        next_attempt_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        locked_by VARCHAR(64) NULL,
+        locked_until DATETIME NULL,
+        last_error TEXT NULL,
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        sent_at DATETIME NULL
+    )
+"""
+
+
+@pytest.fixture
+def stub():
+    server = SMTPStub('127.0.0.1', 0)
+    server.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def app(stub):
+    app = Flask(__name__)
+    app.config.from_object(config['testing'])
+    app.config.update(
+        MAIL_SERVER='127.0.0.1', MAIL_PORT=stub.port, MAIL_USE_SSL=False, MAIL_USE_TLS=False,
+        MAIL_USERNAME=None, MAIL_PASSWORD=None, MAIL_SUPPRESS_SEND=False,
+    )
+    Mail(app)
+    with app.app_context():
+        yield app
+
+
+def test_session_reuses_one_connection(app, stub):
+    session = SMTPSession(app.extensions['mail'])
+    try:
+        for n in range(3):
+            session.send(Message(subject=f"Mail {n}", recipients=[f"user{n}@example.com"], html='<p>Hi</p>'))
+        first = session._conn
+        session.send(Message(subject='Mail 3', recipients=['user3@example.com'], html='<p>Hi</p>'))
+        assert session._conn is first
+    finally:
+        session.close()
+
+    assert [m['rcpt_to'] for m in stub.messages] == [[f"user{n}@example.com"] for n in range(4)]
+    assert b'Subject: Mail 0' in stub.messages[0]['data']
+
+
+@pytest.fixture
+def conn(app):
+    conn = get_db_connection()
+    if conn is None:
+        pytest.skip('MySQL is not available')
+    cur = conn.cursor()
+    cur.execute(OUTBOX_TABLE)
+    cur.close()
+    yield conn
+    cur = conn.cursor()
+    cur.execute("DROP TEMPORARY TABLE IF EXISTS email_outbox")
+    cur.close()
+    conn.close()
+
+
+def test_enqueued_mail_is_delivered(app, stub, conn):
+    cur = conn.cursor()
+    message = Message(subject='Welcome', recipients=['a@example.com', 'b@example.com'],
+                      html='<p>Welcome aboard</p>', sender='Test <noreply@example.com>')
+    enqueue_email(cur, 'welcome', message)
+    conn.commit()
+
+    sent = OutboxWorker(conn, batch_size=10).run(once=True)
+
+    assert sent == 2
+    assert sorted(m['rcpt_to'][0] for m in stub.messages) == ['a@example.com', 'b@example.com']
+    assert all(m['mail_from'] == 'noreply@example.com' for m in stub.messages)
+    cur.execute("SELECT status, attempts, locked_by FROM email_outbox ORDER BY id")
+    assert cur.fetchall() == [('sent', 1, None), ('sent', 1, None)]
+    cur.close()
@@ -0,0 +1,110 @@
+"""Streaming uploads (utils.uploads) posted through the test client.
+
+The app here only installs ``UploadRequest``, like ``create_app`` does, and
+stores into a temporary upload folder.
+"""
+import io
+import os
+
+import pytest
+from flask import Flask, jsonify, request
+
+from config import config
+from utils.uploads import UploadRequest
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\0' * 24
+JPEG = b'\xff\xd8\xff\xe0' + b'\0' * 28
+
+
+def ftyp(brand):
+    return b'\0\0\0\x18ftyp' + brand + b'\0\0\0\0' + brand + b'mp42'
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config.from_object(config['testing'])
+    app.config.update(UPLOAD_FOLDER=str(tmp_path), UPLOAD_MAX_IMAGE_BYTES=1024, UPLOAD_MAX_VIDEO_BYTES=4096)
+    app.request_class = UploadRequest
+
+    @app.route('/upload', methods=['POST'])
+    def upload():
+        file = request.files['file']
+        stored = file.stream.commit() if request.form.get('commit') else None
+        return jsonify(kind=file.stream.kind, extension=file.stream.extension, stored=stored)
+
+    return app
+
+
+@pytest.fixture
+def post(app):
+    client = app.test_client()
+
+    def post(content, filename, **form):
+        return client.post('/upload', data={'file': (io.BytesIO(content), filename), **form},
+                           content_type='multipart/form-data')
+    return post
+
+
+def temp_files(tmp_path):
+    tmp_dir = tmp_path / 'tmp'
+    return sorted(os.listdir(tmp_dir)) if tmp_dir.exists() else []
+
+
+def test_type_comes_from_content_not_filename(post):
+    response = post(PNG, 'photo.jpg')
+
+    assert response.status_code == 200
+    assert response.json == {'kind': 'image', 'extension': 'png', 'stored': None}
+
+
+@pytest.mark.parametrize('content, filename', [
+    (b'%PDF-1.4\n' + b'\0' * 32, 'invoice.jpg'),
+    (b'<?php system($_GET["c"]); ?>' + b'\0' * 16, 'shell.png'),
+    (b'MZ' + b'\0' * 30, 'clip.mp4'),
+])
+def test_spoofed_extension_is_rejected(post, tmp_path, content, filename):
+    assert post(content, filename).status_code == 415
+    assert temp_files(tmp_path) == []
+
+
+@pytest.mark.parametrize('brand', [b'heic', b'avif', b'mif1', b'3gp4'])
+def test_other_iso_media_brands_are_rejected(post, brand):
+    assert post(ftyp(brand) + b'\0' * 32, 'clip.mp4').status_code == 415
+
+
+@pytest.mark.parametrize('brand, extension', [(b'isom', 'mp4'), (b'mp42', 'mp4'), (b'qt  ', 'mov')])
+def test_mp4_and_quicktime_brands_are_accepted(post, brand, extension):
+    response = post(ftyp(brand) + b'\0' * 32, 'clip.bin')
+
+    assert response.status_code == 200
+    assert (response.json['kind'], response.json['extension']) == ('video', extension)
+
+
+def test_size_caps_depend_on_the_sniffed_type(post, tmp_path):
+    assert post(JPEG + b'\0' * 1024, 'big.jpg').status_code == 413
+    assert temp_files(tmp_path) == []
+
+    # The same size is fine for a video, up to the video cap
+    assert post(ftyp(b'isom') + b'\0' * 1024, 'clip.mp4').status_code == 200
+    assert post(ftyp(b'isom') + b'\0' * 4096, 'clip.mp4').status_code == 413
+
+    # A video named .jpg gets the video cap, an image named .mp4 the image cap
+    assert post(ftyp(b'isom') + b'\0' * 2048, 'clip.jpg').status_code == 200
+    assert post(PNG + b'\0' * 2048, 'photo.mp4').status_code == 413
+
+
+def test_uncommitted_upload_is_deleted(post, tmp_path):
+    assert post(PNG, 'photo.png').status_code == 200
+
+    assert temp_files(tmp_path) == []
+    assert sorted(os.listdir(tmp_path)) == ['tmp']
+
+
+def test_committed_upload_moves_into_the_store(post, tmp_path):
+    response = post(PNG, 'photo.png', commit='1')
+
+    stored = response.json['stored']
+    assert stored.endswith('.png')
+    assert (tmp_path / stored).read_bytes() == PNG
+    assert temp_files(tmp_path) == []
@@ -0,0 +1,94 @@
+"""In-process caches.
+
+These live in each worker's memory. ``invalidate`` only clears the worker
+that handled the write, so every entry also has a TTL that bounds how stale
+the other workers can get.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe key -> value cache whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, loader):
+        """Return the cached value for ``key``, calling ``loader()`` on a miss.
+
+        Exceptions from ``loader`` propagate and nothing is cached.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry and entry[0] > now:
+                return entry[1]
+
+        value = loader()
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+        return value
+
+    def invalidate(self, *keys):
+        """Drop the given keys, or everything when called without arguments."""
+        with self._lock:
+            if not keys:
+                self._data.clear()
+            for key in keys:
+                self._data.pop(key, None)
+
+
+class LRUCache:
+    """Thread-safe, size-bounded cache whose entries also expire after ``ttl`` seconds.
+
+    Unlike ``TTLCache`` the caller stores values explicitly, which allows
+    caching ``None`` (e.g. negative lookups); ``get`` returns ``default`` on a
+    miss. ``ttl=None`` keeps entries until they are evicted or invalidated.
+    ``stats()`` gives the hit/miss/eviction totals.
+    """
+
+    def __init__(self, max_entries, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] is not None and entry[0] <= now:
+                del self._data[key]
+                entry = None
+            if entry is None:
+                self._stats['misses'] += 1
+                return default
+            self._data.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry[1]
+
+    def set(self, key, value):
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def invalidate(self, *keys):
+        """Drop the given keys, or everything when called without arguments."""
+        with self._lock:
+            if not keys:
+                self._data.clear()
+            for key in keys:
+                self._data.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, size=len(self._data), max_entries=self.max_entries)
@@ -0,0 +1,327 @@
+"""MySQL connection pooling.
+
+Each worker process lazily builds one ``MySQLConnectionPool`` from the
+``DB_*`` settings in ``config.py``. Inside a request, ``get_db_connection``
+returns one connection per request, stored on ``flask.g`` and shared by the
+view, decorators and context processors. Its ``close()`` does nothing, and
+``release_request_connection`` (a teardown hook) returns it to the pool.
+Outside a request (CLI commands, scripts) callers get a plain pooled connection
+whose ``close()`` returns it to the pool. Streams that a client may abandon
+halfway (the export) use their own ``dedicated_connection`` instead.
+
+Request connections hand out ``InstrumentedCursor``s, which count and time
+every statement on ``g.sql_stats``. ``add_server_timing`` (an after_request
+hook) reports the totals in a ``Server-Timing`` header, along with this
+worker's pool usage (``pool_stats``), and statements slower than
+``SLOW_QUERY_MS`` are logged with the endpoint and parameter types.
+"""
+import logging
+import os
+import threading
+import time
+
+import mysql.connector
+from mysql.connector import errors, pooling
+from flask import current_app as app, g, has_app_context, has_request_context, request
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# pid -> pool. Passenger forks workers after importing the app, and a pool
+# (with its open sockets) must never be shared across a fork.
+_pools = {}
+_pools_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {
+    'checkouts': 0,          # connections handed out
+    'exhausted': 0,          # checkouts that found the pool empty and had to wait
+    'timeouts': 0,           # checkouts that gave up after DB_POOL_TIMEOUT
+    'health_failures': 0,    # dead connections that could not be reconnected
+    'wait_ms': 0.0,          # total time spent waiting on an exhausted pool
+}
+
+
+def _setting(name):
+    if has_app_context():
+        return app.config.get(name, getattr(Config, name))
+    return getattr(Config, name)
+
+
+def _count(key, amount=1):
+    with _stats_lock:
+        _stats[key] += amount
+
+
+def _log(level, message):
+    """app.logger inside the app, this module's logger in bare scripts."""
+    (app.logger if has_app_context() else logger).log(level, message)
+
+
+class CountingPool(pooling.MySQLConnectionPool):
+    """Pool that tracks how many of its connections are borrowed.
+
+    Borrowing goes through ``get_connection`` and ``PooledMySQLConnection.close``
+    hands connections back through ``add_connection``, so counting there
+    gives idle/in-use numbers without reading the connector's queue.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._in_use_lock = threading.Lock()
+        self.in_use = 0
+        super().__init__(*args, **kwargs)
+
+    def get_connection(self):
+        conn = super().get_connection()
+        with self._in_use_lock:
+            self.in_use += 1
+        return conn
+
+    def add_connection(self, cnx=None):
+        super().add_connection(cnx)
+        if cnx is not None:  # a borrowed connection coming back, not a new one
+            with self._in_use_lock:
+                self.in_use -= 1
+
+
+def _get_pool():
+    pid = os.getpid()
+    pool = _pools.get(pid)
+    if pool is not None:
+        return pool
+
+    with _pools_lock:
+        pool = _pools.get(pid)
+        if pool is None:
+            pool = CountingPool(
+                pool_name=f"{_setting('DB_POOL_NAME')}_{pid}",
+                pool_size=min(_setting('DB_POOL_SIZE'), pooling.CNX_POOL_MAXSIZE),
+                pool_reset_session=True,
+                # The request connection is shared by several callers, so a
+                # half-read result set would break the next query. Streaming
+                # readers ask for cursor(buffered=False) explicitly.
+                buffered=True,
+                host=_setting('DB_HOST'),
+                database=_setting('DB_NAME'),
+                user=_setting('DB_USER'),
+                password=_setting('DB_PASSWORD'),
+            )
+            _pools.clear()  # drop any pool inherited from the parent process
+            _pools[pid] = pool
+    return pool
+
+
+def _checkout(pool):
+    """Borrow a connection, waiting up to DB_POOL_TIMEOUT if the pool is empty.
+
+    ``MySQLConnectionPool.get_connection`` pings the borrowed connection and
+    reconnects it when the server has dropped it, which is our health check.
+    """
+    timeout = _setting('DB_POOL_TIMEOUT')
+    started = time.monotonic()
+    delay = 0.005
+    waited = False
+
+    while True:
+        try:
+            conn = pool.get_connection()
+        except errors.InterfaceError:
+            # get_connection already requeued the dead connection
+            _count('health_failures')
+            raise
+        except errors.PoolError:
+            if not waited:
+                waited = True
+                _count('exhausted')
+            elapsed = time.monotonic() - started
+            if elapsed >= timeout:
+                _count('timeouts')
+                _count('wait_ms', elapsed * 1000)
+                raise
+            time.sleep(min(delay, timeout - elapsed))
+            delay = min(delay * 2, 0.1)
+            continue
+
+        if waited:
+            _count('wait_ms', (time.monotonic() - started) * 1000)
+        _count('checkouts')
+        return conn
+
+
+def _param_shape(params):
+    """Types of the bound parameters, never their values (they may be PII)."""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    return tuple(type(value).__name__ for value in params)
+
+
+def _record_query(operation, params, elapsed_ms):
+    stats = g.get('sql_stats')
+    if stats is None:
+        stats = g.sql_stats = {'count': 0, 'total_ms': 0.0, 'slowest_ms': 0.0, 'slowest_sql': None}
+    stats['count'] += 1
+    stats['total_ms'] += elapsed_ms
+    if elapsed_ms > stats['slowest_ms']:
+        stats['slowest_ms'] = elapsed_ms
+        stats['slowest_sql'] = operation
+
+    threshold = _setting('SLOW_QUERY_MS')
+    if threshold is not None and elapsed_ms >= threshold:
+        statement = ' '.join(str(operation).split())
+        app.logger.warning(
+            f"Slow query ({elapsed_ms:.1f} ms) in {request.endpoint}: {statement} "
+            f"params={_param_shape(params)}"
+        )
+
+
+class InstrumentedCursor:
+    """Cursor wrapper that times ``execute``/``executemany`` for the request."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def _timed(self, method, operation, params, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(operation, params, *args, **kwargs)
+        finally:
+            _record_query(operation, params, (time.perf_counter() - started) * 1000)
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        return self._timed(self._cursor.execute, operation, params, *args, **kwargs)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        return self._timed(self._cursor.executemany, operation, seq_params, *args, **kwargs)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class RequestConnection:
+    """Request-scoped wrapper around a pooled connection.
+
+    Views still call ``conn.close()`` in their ``finally`` blocks, often before
+    ``render_template`` runs the context processors. So ``close()`` is a no-op
+    here and the connection is only released at teardown.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def close(self):
+        pass
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def _connect():
+    try:
+        return _checkout(_get_pool())
+    except errors.PoolError:
+        _log(logging.WARNING, f"MySQL pool exhausted after {_setting('DB_POOL_TIMEOUT')}s: {pool_stats()}")
+    except mysql.connector.Error as e:
+        _log(logging.ERROR, f"Database connection error: {e}")
+    return None
+
+
+def dedicated_connection():
+    """A new connection outside the pool, for long streaming reads; close it when done.
+
+    Pure-Python protocol, so ``shutdown()`` can drop a stream abandoned halfway
+    without reading the rest of its result set (the C extension drains it).
+    """
+    try:
+        return mysql.connector.connect(
+            host=_setting('DB_HOST'),
+            database=_setting('DB_NAME'),
+            user=_setting('DB_USER'),
+            password=_setting('DB_PASSWORD'),
+            use_pure=True,
+        )
+    except mysql.connector.Error as e:
+        _log(logging.ERROR, f"Database connection error: {e}")
+    return None
+
+
+def get_db_connection():
+    """Return the request's MySQL connection (opened lazily), or None on failure."""
+    if not has_request_context():
+        return _connect()
+
+    conn = g.get('db_conn')
+    if conn is None:
+        raw = _connect()
+        if raw is None:
+            return None
+        conn = g.db_conn = RequestConnection(raw)
+    return conn
+
+
+def release_request_connection(exc=None):
+    """Teardown hook: roll back anything left uncommitted and return the connection."""
+    conn = g.pop('db_conn', None)
+    if conn is None:
+        return
+    raw = conn._conn
+    try:
+        raw.rollback()
+    except mysql.connector.Error:
+        pass
+    finally:
+        try:
+            raw.close()
+        except mysql.connector.Error as e:
+            app.logger.warning(f"Failed to return MySQL connection to pool: {e}")
+
+
+def add_server_timing(response):
+    """after_request hook: expose the request's SQL totals as ``Server-Timing``.
+
+    Only counts and durations go in the header; the slowest statement itself is
+    left to the slow-query log. ``db-pool`` is this worker's pool as the
+    response goes out (this request's connection is still checked out):
+    connections in use out of the pool size, and how often (and how long, in
+    total) checkouts have had to wait for one.
+    """
+    stats = g.get('sql_stats')
+    if stats:
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={stats["total_ms"]:.1f};desc="{stats["count"]} queries", '
+            f'db-slowest;dur={stats["slowest_ms"]:.1f}',
+        )
+    if os.getpid() in _pools:
+        pool = pool_stats()
+        response.headers.add(
+            'Server-Timing',
+            f'db-pool;dur={pool["wait_ms"]:.1f};desc="{pool["in_use"]}/{pool["size"]} in use, '
+            f'{pool["exhausted"]} waits, {pool["timeouts"]} timeouts"',
+        )
+    return response
+
+
+def pool_stats():
+    """Snapshot of this worker's pool counters."""
+    with _stats_lock:
+        snapshot = dict(_stats)
+    pool = _pools.get(os.getpid())
+    snapshot['size'] = pool.pool_size if pool else 0
+    snapshot['in_use'] = pool.in_use if pool else 0
+    snapshot['idle'] = snapshot['size'] - snapshot['in_use']
+    return snapshot
@@ -0,0 +1,69 @@
+"""``{% cache %}`` tag for Jinja templates.
+
+    {% cache 'card', business.id, business.version, viewer %}
+        ... expensive markup ...
+    {% endcache %}
+
+The body is rendered once per key and kept as a pre-rendered (already
+escaped) string in a bounded, per-worker ``utils.cache.LRUCache``. The key
+must cover everything the body reads. If any key part is None the body is
+rendered uncached, so half-loaded data (e.g. no categories because the DB
+was down) is never stored.
+
+``fragment_cache.stats()`` gives the worker's hit/miss/eviction totals.
+Each request's hits and misses also go into a ``Server-Timing`` entry
+(``add_fragment_timing``).
+"""
+from flask import g, has_request_context
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+from config import Config
+from utils.cache import LRUCache
+
+# Keys carry the content version, so entries never go stale; only size bounds them
+fragment_cache = LRUCache(max_entries=Config.FRAGMENT_CACHE_MAX_ENTRIES)
+
+
+def _count_request(outcome):
+    if has_request_context():
+        stats = g.setdefault('fragment_stats', {'hits': 0, 'misses': 0})
+        stats[outcome] += 1
+
+
+class FragmentCacheExtension(Extension):
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_render', [nodes.List(key)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render(self, key, caller):
+        if any(part is None for part in key):
+            return caller()
+        key = tuple(key)
+        html = fragment_cache.get(key)
+        if html is not None:
+            _count_request('hits')
+            return html
+        html = caller()
+        fragment_cache.set(key, html)
+        _count_request('misses')
+        return html
+
+
+def add_fragment_timing(response):
+    """after_request hook: report this request's fragment cache hits/misses."""
+    stats = g.get('fragment_stats')
+    if stats:
+        response.headers.add(
+            'Server-Timing',
+            f'fragments;desc="{stats["hits"]} hits, {stats["misses"]} misses"',
+        )
+    return response
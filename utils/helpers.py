@@ -1,8 +1,12 @@
+import hashlib
 import os 
 from flask import current_app as app, request, request, url_for, session, redirect, url_for, flash
 from itsdangerous import URLSafeTimedSerializer
 import mysql.connector
-from werkzeug.utils import secure_filename
+from utils.db import get_db_connection  # re-exported for routes
+from utils.cache import TTLCache
+from utils.media_store import store_stream, upload_url
+from utils.uploads import UploadStream
 from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
@@ -60,20 +64,6 @@ def owner_or_admin_required(business_id):
         return decorated_function
     return decorator
 
-def upload_file(file):
-    """Handle file uploads and return properly formatted full web URL"""
-    if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        upload_folder = app.config['UPLOAD_FOLDER']
-        os.makedirs(upload_folder, exist_ok=True)
-        file_path = os.path.join(upload_folder, filename)
-        file.save(file_path)
-        base_url = request.host_url.rstrip('/')
-        static_path = f"/static/uploads/{filename}"
-        return f"{base_url}{static_path}"
-    return None
-
-
 # 
 # 
 
@@ -93,109 +83,90 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in config.ALLOWED_EXTENSIONS
 
 # UPLOAD Images and Videos Function
-# def upload_file(file):
-#     if file and allowed_file(file.filename):
-#         filename = secure_filename(file.filename)
-#         file_path = os.path.join(config.UPLOAD_FOLDER, filename)
-#         file.save(file_path)
-#         return filename  
-#     return None
-
 def upload_file(file):
-    """Handle file uploads and return PROPERLY FORMATTED full web URL"""
+    """Store an upload by content hash and return its full web URL.
+
+    e.g. "http://localhost:5000/static/uploads/3f/a2/3fa2...c9.png". The caller
+    records the reference with utils.media_store.retain_media/swap_media.
+    """
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        upload_folder = app.config['UPLOAD_FOLDER']
-        print(upload_folder)
-        # Create directory if it doesn't exist
-        os.makedirs(upload_folder, exist_ok=True)
-        
-        # Save the file
-        file_path = os.path.join(upload_folder, filename)
-        file.save(file_path)
-        
-        # PROPERLY construct the full URL with correct slashes
-        base_url = request.host_url.rstrip('/')  # Gets "http://localhost:5000"
-        # static_path = f"/static/uploads/{filename}"  # Note leading slash
-        static_path = f"/static/uploads/{filename}"  # Note leading slash
-        full_url = f"{base_url}{static_path}"  # Correctly joins with slash
-        
-        return full_url  # "http://localhost:5000/static/uploads/02.png"
+        if isinstance(file.stream, UploadStream):
+            # Already sniffed, size-checked and hashed while the request was parsed
+            return upload_url(file.stream.commit())
+        ext = file.filename.rsplit('.', 1)[1].lower()  # checked by allowed_file
+        relative, _digest, _size = store_stream(file.stream, ext)
+        return upload_url(relative)
     return None
 
-# # Function to establish a direct MySQL connection
-def get_db_connection():
+# Categories and plans change about once a week but every template render
+# needs them (navbar, plan pickers), so they are served from memory.
+reference_cache = TTLCache(ttl=config.REFERENCE_CACHE_TTL)
+
+def _load_categories():
+    conn = get_db_connection()
+    if not conn:
+        raise mysql.connector.Error("No database connection")
     try:
-        # Fetching connection parameters from environment variables
-        conn = mysql.connector.connect(
-            host=os.getenv('DB_HOST', 'localhost'),  
-            database=os.getenv('DB_NAME', 'hfp_data'),  
-            user=os.getenv('DB_USER', 'root'),  # Default MySQL username
-            password=os.getenv('DB_PASSWORD', 'password')  # Default MySQL password
-        )
-        if conn.is_connected():
-            print("Successfully connected to MySQL database!")
-        return conn
-    except mysql.connector.Error as e:
-        print(f"Error: {e}")
-    return None
+        cur = conn.cursor(dictionary=True)  # Fetch rows as dictionaries
+        cur.execute("SELECT id, category_name, slug FROM categories")
+        result = cur.fetchall()
+        cur.close()
+        return [{"id": row['id'], 'name': row['category_name'], 'slug': row['slug'] } for row in result]
+    finally:
+        conn.close()
+
+def _load_category_snapshot():
+    categories = _load_categories()
+    # Content fingerprint, identical across workers; keys the navbar fragment
+    fingerprint = hashlib.sha1(repr([(c['id'], c['name'], c['slug']) for c in categories]).encode()).hexdigest()[:16]
+    return categories, fingerprint
+
+def _load_plans():
+    conn = get_db_connection()
+    if not conn:
+        raise mysql.connector.Error("No database connection")
+    try:
+        cur = conn.cursor(dictionary=True)
+        cur.execute("""
+            SELECT id, plan_name, amount, duration
+            FROM subscription_plans
+        """)
+        result = cur.fetchall()
+        cur.close()
+        return [
+            {
+            "id": row['id'], 'plan_name': row['plan_name'],
+            'amount': row['amount'], 'duration':row['duration']
+        } 
+        for row in result
+        ]
+    finally:
+        conn.close()
 
 def fetch_categories():
-    conn = get_db_connection()
-    categories = []
-    if conn:
-        try:
-            cur = conn.cursor(dictionary=True)  # Fetch rows as dictionaries
-            cur.execute("SELECT id, category_name, slug FROM categories")
-            result = cur.fetchall()
-            # categories = {row['id']: row['category_name'] for row in result}  # Convert to dict
-
-            categories = [{"id": row['id'], 'name': row['category_name'], 'slug': row['slug'] } for row in result]  # List of named tuples
-            
-        except mysql.connector.Error as e:
-            print(f"Database error: {e}")
-        finally:
-            cur.close()
-            conn.close()
-            
-    # return categories  # Return categories as dict
-    return {"categories": categories}
+    categories, categories_version = [], None
+    try:
+        categories, categories_version = reference_cache.get('categories', _load_category_snapshot)
+    except mysql.connector.Error as e:
+        print(f"Database error: {e}")
+    return {"categories": categories, "categories_version": categories_version}
 
 def fetch_plans():
-    conn = get_db_connection()
     plans = []
-    if conn:
-        try:
-            cur = conn.cursor(buffered=True, dictionary=True)  # Fetch rows as dictionaries
-            # cur.execute("SELECT id, category_name FROM categories")
-             # Fetch subscription plans
-            cur.execute("""
-                SELECT id, plan_name, amount, duration
-                FROM subscription_plans
-            """)
-            
-            # subscription_plans = cur.fetchall()
-            
-            result = cur.fetchall()
-            # categories = {row['id']: row['category_name'] for row in result}  # Convert to dict
-
-            plans = [
-                {
-                "id": row['id'], 'plan_name': row['plan_name'],
-                'amount': row['amount'], 'duration':row['duration']
-            } 
-            for row in result
-            ]  # List of named tuples
-            
-        except mysql.connector.Error as e:
-            print(f"Database error: {e}")
-        finally:
-            cur.close()
-            conn.close()
-            
-    # return categories  # Return categories as dict
+    try:
+        plans = reference_cache.get('subscription_plans', _load_plans)
+    except mysql.connector.Error as e:
+        print(f"Database error: {e}")
     return {"subscription_plans": plans }
 
+def invalidate_reference_cache():
+    """Drop this worker's cached categories and plans.
+
+    Writes to either table call services.listing.invalidate_reference_data,
+    which also purges the pages and sitemaps built from them.
+    """
+    reference_cache.invalidate()
+
 def generate_token(email):
     """Generate a time-sensitive verification token"""
     return serializer.dumps(email, salt='email-verification-salt')
@@ -224,4 +195,16 @@ def verify_reset_token(token, expiration=3600):
         user_id = serializer.loads(token, salt='password-reset-salt', max_age=expiration)
     except:
         return None
-    return user_id
\ No newline at end of file
+    return user_id
+
+# ## Keyset pagination cursors ##
+def encode_cursor(values):
+    """Opaque, signed token for a keyset pagination position"""
+    return serializer.dumps(values, salt='pagination-cursor')
+
+def decode_cursor(token):
+    """Return the values packed by encode_cursor, or None if tampered/invalid"""
+    try:
+        return serializer.loads(token, salt='pagination-cursor')
+    except Exception:
+        return None
@@ -0,0 +1,140 @@
+"""Responsive variants for uploaded images.
+
+An image upload is decoded once, rotated upright from its EXIF orientation,
+flattened to RGB, and written as ``thumb``/``card``/``full`` variants, each
+as a progressive JPEG and a WebP. Variants are never upscaled: a 500px logo
+gets a thumb and a 500px card, and no full. Nothing from the original's
+metadata (EXIF, GPS, ICC, comments) is copied.
+
+The result is stored as JSON next to the media URL
+(``businesses.media_variants`` / ``media_variants_2``,
+``business_listing.media_variants``):
+
+    {"card": {"width": 640, "height": 427, "jpeg": "/static/...", "webp": "/static/..."}, ...}
+
+and templates turn it into ``srcset`` with the ``media_variants`` and
+``srcset`` filters (see ``_partials/_media.html``).
+For videos the same columns hold their metadata instead (utils.videos).
+
+Pillow is optional. Without it, or for files it can't decode, no variants
+are stored and templates fall back to the original URL.
+"""
+import json
+import os
+import posixpath
+import tempfile
+
+from flask import current_app as app
+
+from utils.media_store import upload_dir
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # uploads still work, just without variants
+    Image = ImageOps = None
+
+# name -> max width (px): thumb for the 50-120px lists and gallery, card for
+# the 180px card box on 2x screens, full for the profile page
+VARIANTS = (('thumb', 160), ('card', 640), ('full', 1600))
+
+FORMATS = (
+    ('jpeg', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    ('webp', 'webp', {'quality': 80, 'method': 4}),
+)
+
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+
+
+def _flatten(image):
+    """RGB copy, with any transparency composited onto white."""
+    if image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _save_atomic(image, path, fmt, options):
+    """Variant URLs are served as immutable, so a reader must never see a partial file."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            image.save(out, fmt, **options)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def build_variants(source_path, dest_dir, stem, url_prefix):
+    """Write the variants of one image; returns the variants dict, or None if it can't be decoded."""
+    if Image is None:
+        return None
+    largest = VARIANTS[-1][1]
+    try:
+        with Image.open(source_path) as original:
+            # JPEG: let the decoder downscale by a power of two up front
+            original.draft('RGB', (largest, largest))
+            image = _flatten(ImageOps.exif_transpose(original))
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        app.logger.warning(f"Could not decode image {source_path}: {e}")
+        return None
+
+    os.makedirs(dest_dir, exist_ok=True)
+    variants = {}
+    previous_width = None
+    for name, max_width in VARIANTS:
+        width = min(max_width, image.width)
+        if width == previous_width:
+            break  # the original is smaller than this variant
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        resized.info = {}  # strip metadata
+        entry = {'width': width, 'height': height}
+        for fmt, ext, options in FORMATS:
+            filename = f"{stem}-{name}.{ext}"
+            _save_atomic(resized, os.path.join(dest_dir, filename), fmt.upper(), options)
+            entry[fmt] = f"{url_prefix}/{filename}"
+        variants[name] = entry
+        previous_width = width
+    return variants
+
+
+def image_variants(media_url):
+    """Build variants for an uploaded image from its URL; returns JSON for the DB, or None."""
+    if not media_url or '/static/uploads/' not in media_url:
+        return None
+    relative = media_url.split('/static/uploads/', 1)[1]
+    directory, filename = posixpath.split(relative)
+    stem, ext = os.path.splitext(filename)
+    if ext.lstrip('.').lower() not in IMAGE_EXTENSIONS:
+        return None
+    # Content-addressed uploads keep their variants beside them (same shard);
+    # legacy flat uploads use variants/
+    directory = directory or 'variants'
+    variants = build_variants(
+        os.path.join(upload_dir(), relative),
+        os.path.join(upload_dir(), directory),
+        stem,
+        f'/static/uploads/{directory}',
+    )
+    return json.dumps(variants, separators=(',', ':')) if variants else None
+
+
+def media_variants_filter(value):
+    """Jinja ``media_variants``: the stored JSON as a dict (None when absent or invalid)."""
+    if not value:
+        return None
+    if isinstance(value, dict):
+        return value
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def srcset_filter(variants, fmt='jpeg'):
+    """Jinja ``srcset``: "url 160w, url 640w, ..." for one format."""
+    return ', '.join(f"{v[fmt]} {v['width']}w" for v in (variants or {}).values() if v.get(fmt))
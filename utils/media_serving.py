@@ -0,0 +1,99 @@
+"""Serving uploaded media.
+
+Uploads keep their ``/static/uploads/...`` URLs, but the ``static``
+endpoint hands those paths to ``send_upload`` instead of Flask's static
+handler:
+
+- files come from ``UPLOAD_FOLDER`` (``utils.media_store.upload_dir``);
+  in-progress uploads under ``tmp/`` are never served;
+- ETags are strong: the content hash for content-addressed files (their
+  name), ``<mtime>-<size>`` for legacy flat uploads. ``If-None-Match`` /
+  ``If-Modified-Since`` get a 304 and ``If-Range`` works for resumed video;
+- byte ranges are answered with 206 by Werkzeug, streaming from the file.
+
+``MEDIA_SENDFILE`` hands the bytes to the front server so video never
+flows through a Python worker. The app still answers conditional requests
+itself (304s carry the content-hash ETag); the server does ranges:
+
+- ``x-sendfile``: Apache mod_xsendfile / lighttpd, ``XSendFile On`` with
+  ``XSendFilePath`` set to the upload folder;
+- ``x-accel-redirect``: nginx, with an internal location mapping
+  ``MEDIA_ACCEL_PREFIX`` to the upload folder::
+
+      location /_uploads/ {
+          internal;
+          alias /srv/hfp_busy/static/uploads/;
+      }
+"""
+import os
+from urllib.parse import quote
+
+from flask import abort, current_app as app, request, send_file
+from werkzeug.security import safe_join
+from werkzeug.utils import send_file as werkzeug_send_file
+
+from utils.media_store import upload_dir
+
+UPLOADS_PREFIX = 'uploads/'
+
+SENDFILE_MODES = {'', 'x-sendfile', 'x-accel-redirect'}
+
+# <64 hex> or <64 hex>-<variant>: the name already identifies the bytes
+CONTENT_ADDRESSED = frozenset('0123456789abcdef')
+
+
+def upload_etag(relative, stat):
+    stem = os.path.splitext(os.path.basename(relative))[0]
+    digest = stem.split('-', 1)[0]
+    if len(digest) == 64 and set(digest) <= CONTENT_ADDRESSED:
+        return stem
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def send_upload(relative):
+    """Response for ``/static/uploads/<relative>``."""
+    root = upload_dir()
+    path = safe_join(root, relative)
+    if path is None:
+        abort(404)
+    # Checked on the normalized path, so ./tmp/ and x/../tmp/ are caught too
+    path = os.path.normpath(path)
+    relative = os.path.relpath(path, root).replace(os.sep, '/')
+    if relative == 'tmp' or relative.startswith('tmp/'):
+        abort(404)
+    try:
+        stat = os.stat(path) if path else None
+    except OSError:
+        stat = None
+    if stat is None or not os.path.isfile(path):
+        abort(404)
+
+    mode = app.config['MEDIA_SENDFILE']
+    if mode not in SENDFILE_MODES:
+        app.logger.warning(f"Unknown MEDIA_SENDFILE {mode!r}; serving uploads from Python")
+        mode = ''
+    etag = upload_etag(relative, stat)
+    if not mode:
+        return send_file(path, etag=etag, conditional=True, last_modified=stat.st_mtime)
+
+    # Headers and 304/412 from here, bytes and ranges from the front server
+    response = werkzeug_send_file(path, request.environ, etag=etag, last_modified=stat.st_mtime,
+                                  use_x_sendfile=True, conditional=False,
+                                  response_class=app.response_class)
+    response = response.make_conditional(request.environ)
+    response.headers['Accept-Ranges'] = 'bytes'
+    sendfile = response.headers.pop('X-Sendfile', None)
+    if response.status_code != 200:
+        return response
+    if mode == 'x-accel-redirect':
+        response.headers['X-Accel-Redirect'] = app.config['MEDIA_ACCEL_PREFIX'].rstrip('/') + '/' + quote(relative)
+    else:
+        response.headers['X-Sendfile'] = sendfile
+    return response
+
+
+def static_view(filename):
+    """View for the ``static`` endpoint: uploads go through send_upload."""
+    if filename.startswith(UPLOADS_PREFIX):
+        return send_upload(filename[len(UPLOADS_PREFIX):])
+    return app.send_static_file(filename)
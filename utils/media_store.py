@@ -0,0 +1,171 @@
+"""Content-addressed storage for uploads.
+
+Every upload is stored under the SHA-256 of its bytes, sharded two levels
+deep so no directory grows past a few thousand entries:
+
+    static/uploads/3f/a2/3fa2...c9.jpg          the upload
+    static/uploads/3f/a2/3fa2...c9-card.webp    its variants (utils.images)
+
+The hash is computed while the upload is copied to a temp file, which is
+then renamed into place (MP4/MOV after moving their index to the front,
+see utils.mp4). If that path already exists the bytes are already stored,
+so the copy is dropped. Identical files are stored once and a stored
+file never changes, so these URLs are served with ``Cache-Control:
+immutable`` (``add_upload_cache_headers``).
+
+``media_objects`` counts the rows that reference each file. Write paths
+call ``retain_media`` / ``release_media`` / ``swap_media`` in their own
+transaction. ``flask media gc`` deletes files whose count has been zero for
+longer than a grace period, along with files that no row ever referenced
+(e.g. the upload's transaction rolled back). Uploads from before this scheme
+(flat ``static/uploads/<name>``) are ignored by the counting; ``flask media
+import-legacy`` moves them in.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import struct
+import tempfile
+
+from flask import current_app as app, request
+
+from utils.mp4 import FASTSTART_EXTENSIONS, faststart_file
+
+CHUNK_SIZE = 64 * 1024
+
+# /static/uploads/<2>/<2>/<64 hex>.<ext>
+UPLOAD_URL = re.compile(r'/static/uploads/(([0-9a-f]{2})/([0-9a-f]{2})/(\2\3[0-9a-f]{60})\.([a-z0-9]+))$')
+# ...and the variants stored next to it
+IMMUTABLE_PATH = re.compile(r'^/static/uploads/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(-[a-z]+)?\.[a-z0-9]+$')
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def upload_dir():
+    folder = app.config['UPLOAD_FOLDER']
+    return folder if os.path.isabs(folder) else os.path.join(app.root_path, folder)
+
+
+def shard_path(digest, ext):
+    """Path of a stored file relative to the upload folder, with '/' separators."""
+    return f"{digest[:2]}/{digest[2:4]}/{digest}.{ext}"
+
+
+def place_stored(tmp_path, digest, ext):
+    """Rename a fully written temp file (under upload_dir()/tmp) into the store; returns its relative path.
+
+    MP4/MOV files are first rewritten with their index up front (utils.mp4),
+    which changes their digest.
+    """
+    if ext in FASTSTART_EXTENSIONS:
+        try:
+            digest = faststart_file(tmp_path) or digest
+        except (ValueError, struct.error) as e:
+            app.logger.warning(f"Stored .{ext} upload without faststart: {e}")
+    relative = shard_path(digest, ext)
+    final_path = os.path.join(upload_dir(), relative)
+    try:
+        if os.path.exists(final_path):
+            # Already stored; touching it restarts gc's grace period
+            os.unlink(tmp_path)
+            os.utime(final_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, final_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return relative
+
+
+def store_stream(stream, ext):
+    """Copy a binary stream into the store; returns (relative path, digest, size)."""
+    tmp_dir = os.path.join(upload_dir(), 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    sha = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    relative = place_stored(tmp_path, sha.hexdigest(), ext)
+    return relative, posixpath.basename(relative).split('.', 1)[0], size
+
+
+def upload_url(relative):
+    """Absolute URL of a stored file, in the format upload_file has always returned."""
+    return f"{request.host_url.rstrip('/')}/static/uploads/{relative}"
+
+
+def parse_upload_url(url):
+    """(relative path, digest) for a content-addressed upload URL, else None."""
+    match = UPLOAD_URL.search(url or '')
+    return (match.group(1), match.group(4)) if match else None
+
+
+def retain_media(cur, url):
+    """Count one more reference to ``url`` (no-op for legacy or external URLs)."""
+    parsed = parse_upload_url(url)
+    if not parsed:
+        return
+    relative, digest = parsed
+    try:
+        size = os.path.getsize(os.path.join(upload_dir(), relative))
+    except OSError:
+        size = None
+    cur.execute("""
+        INSERT INTO media_objects (digest, path, size, refcount) VALUES (%s, %s, %s, 1)
+        ON DUPLICATE KEY UPDATE refcount = refcount + 1, released_at = NULL
+    """, (digest, relative, size))
+
+
+def release_media(cur, url):
+    """Drop one reference to ``url``; the file goes at the next gc past the grace period."""
+    parsed = parse_upload_url(url)
+    if not parsed:
+        return
+    # released_at first: MySQL evaluates SET assignments left to right
+    cur.execute("""
+        UPDATE media_objects
+        SET released_at = IF(refcount <= 1, NOW(), released_at),
+            refcount = GREATEST(refcount - 1, 0)
+        WHERE digest = %s
+    """, (parsed[1],))
+
+
+def swap_media(cur, old_url, new_url):
+    """A media column changed from ``old_url`` to ``new_url``."""
+    if old_url == new_url:
+        return
+    retain_media(cur, new_url)
+    release_media(cur, old_url)
+
+
+def release_business_media(cur, business_id):
+    """Release a business's media; call before deleting the row."""
+    cur.execute("SELECT media_url, media_url_2 FROM businesses WHERE id = %s", (business_id,))
+    row = cur.fetchone()
+    if row:
+        for url in (row.values() if isinstance(row, dict) else row):
+            release_media(cur, url)
+
+
+def add_upload_cache_headers(response):
+    """after_request hook: content-addressed uploads never change."""
+    if request.endpoint == 'static' and response.status_code in (200, 206, 304) \
+            and IMMUTABLE_PATH.match(request.path):
+        response.headers['Cache-Control'] = IMMUTABLE
+    return response
@@ -0,0 +1,233 @@
+"""MP4/QuickTime atom handling: faststart and basic metadata.
+
+Encoders usually write the ``moov`` atom (the index a player needs before it
+can show a frame) after the media data, so a browser must download the whole
+file before playback starts. ``faststart`` rewrites the file with ``moov``
+ahead of ``mdat``, like ffmpeg's qt-faststart: only ``moov`` is held in
+memory, the media data is copied in fixed-size chunks, and every chunk
+offset (``stco``, or ``co64`` when an offset no longer fits in 32 bits) is
+moved by the size of the relocated ``moov``.
+
+``probe`` reads duration and display size from ``mvhd`` and the video
+track's ``tkhd``. Neither needs anything outside the standard library.
+"""
+import hashlib
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+CHUNK_SIZE = 64 * 1024
+
+FASTSTART_EXTENSIONS = {'mp4', 'mov'}
+
+# Atoms whose children are walked to reach the chunk offset tables
+CONTAINERS = {b'moov', b'trak', b'mdia', b'minf', b'stbl'}
+
+# A moov this large is not a real index; don't load it into memory
+MAX_MOOV_SIZE = 64 * 1024 * 1024
+
+
+def _top_level_atoms(src):
+    """[(type, offset, size)] for the file's top-level atoms."""
+    src.seek(0, os.SEEK_END)
+    end = src.tell()
+    atoms = []
+    offset = 0
+    while offset + 8 <= end:
+        src.seek(offset)
+        size, kind = struct.unpack('>I4s', src.read(8))
+        if size == 1:
+            size = struct.unpack('>Q', src.read(8))[0]
+        elif size == 0:
+            size = end - offset
+        if size < 8 or offset + size > end:
+            raise ValueError(f"Truncated or corrupt {kind!r} atom at {offset}")
+        atoms.append((kind, offset, size))
+        offset += size
+    return atoms
+
+
+def _children(data):
+    """(type, payload) for the atoms packed in ``data``."""
+    offset = 0
+    while offset + 8 <= len(data):
+        size, kind = struct.unpack_from('>I4s', data, offset)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = len(data) - offset
+        if size < header or offset + size > len(data):
+            raise ValueError(f"Corrupt {kind!r} atom inside moov")
+        yield kind, data[offset + header:offset + size]
+        offset += size
+
+
+def _atom(kind, payload):
+    return struct.pack('>I4s', len(payload) + 8, kind) + payload
+
+
+def _offsets(kind, payload):
+    """Version/flags and the entries of an stco/co64 payload."""
+    count = struct.unpack_from('>I', payload, 4)[0]
+    entries = array('Q' if kind == b'co64' else 'I', payload[8:8 + count * (8 if kind == b'co64' else 4)])
+    if len(entries) != count:
+        raise ValueError(f"Truncated {kind!r}")
+    if sys.byteorder == 'little':
+        entries.byteswap()
+    return payload[:4], entries
+
+
+def _pack_offsets(kind, flags, entries):
+    packed = array('Q' if kind == b'co64' else 'I', entries)
+    if sys.byteorder == 'little':
+        packed.byteswap()
+    return _atom(kind, flags + struct.pack('>I', len(entries)) + packed.tobytes())
+
+
+def _patch(kind, payload, shift, use_co64):
+    """Rebuild an atom with its chunk offsets moved by ``shift(offset)``."""
+    if kind in CONTAINERS:
+        return _atom(kind, b''.join(_patch(k, p, shift, use_co64) for k, p in _children(payload)))
+    if kind in (b'stco', b'co64'):
+        flags, entries = _offsets(kind, payload)
+        moved = [shift(offset) for offset in entries]
+        if kind == b'stco' and (use_co64 or (moved and max(moved) > 0xFFFFFFFF)):
+            if not use_co64:
+                raise OverflowError
+            kind = b'co64'
+        return _pack_offsets(kind, flags, moved)
+    if kind == b'cmov':
+        raise ValueError('Compressed moov atoms are not supported')
+    return _atom(kind, payload)
+
+
+def _copy(src, offset, size, write):
+    src.seek(offset)
+    while size > 0:
+        chunk = src.read(min(CHUNK_SIZE, size))
+        if not chunk:
+            raise ValueError('Unexpected end of file')
+        write(chunk)
+        size -= len(chunk)
+
+
+def faststart(src, write):
+    """Write ``src`` (a seekable binary file) with moov first; returns False if it already was.
+
+    ``write`` is only called when the file needs rewriting. Raises
+    ValueError for files that aren't valid MP4/QuickTime.
+    """
+    atoms = _top_level_atoms(src)
+    kinds = [kind for kind, _offset, _size in atoms]
+    if b'moov' not in kinds or b'mdat' not in kinds:
+        raise ValueError('Missing moov or mdat atom')
+    moov_index, mdat_index = kinds.index(b'moov'), kinds.index(b'mdat')
+    if moov_index < mdat_index:
+        return False
+
+    _kind, moov_offset, moov_size = atoms[moov_index]
+    if moov_size > MAX_MOOV_SIZE:
+        raise ValueError(f"moov atom too large ({moov_size} bytes)")
+    src.seek(moov_offset)
+    moov = src.read(moov_size)
+    header = 16 if struct.unpack_from('>I', moov)[0] == 1 else 8
+    payload = moov[header:]
+
+    # The moov goes right before the first mdat, so everything from there up
+    # to its old position moves down by its (possibly grown) size, and
+    # everything after it by however much it grew
+    insert_at = atoms[mdat_index][1]
+    moov_end = moov_offset + moov_size
+
+    def rebuild(use_co64):
+        size = moov_size
+
+        def shift(offset):
+            if insert_at <= offset < moov_offset:
+                return offset + size
+            if offset >= moov_end:
+                return offset + size - moov_size
+            return offset
+
+        while True:
+            new_moov = _patch(b'moov', payload, shift, use_co64)
+            if len(new_moov) == size:
+                return new_moov
+            size = len(new_moov)
+
+    try:
+        new_moov = rebuild(use_co64=False)
+    except OverflowError:
+        new_moov = rebuild(use_co64=True)
+
+    for index, (kind, offset, size) in enumerate(atoms):
+        if index == mdat_index:
+            write(new_moov)
+        if index != moov_index:
+            _copy(src, offset, size, write)
+    return True
+
+
+def faststart_file(path):
+    """Apply faststart to the file at ``path`` in place; returns its new SHA-256, or None if unchanged."""
+    fd, out_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+    sha = hashlib.sha256()
+    try:
+        with open(path, 'rb') as src, os.fdopen(fd, 'wb') as out:
+            def write(chunk):
+                sha.update(chunk)
+                out.write(chunk)
+            moved = faststart(src, write)
+        if not moved:
+            os.unlink(out_path)
+            return None
+        os.replace(out_path, path)
+    except BaseException:
+        if os.path.exists(out_path):
+            os.unlink(out_path)
+        raise
+    return sha.hexdigest()
+
+
+def _full_box(payload, v0, v1):
+    """Unpack the fields after version/flags using the format for the box's version."""
+    return struct.unpack_from(v1 if payload[0] == 1 else v0, payload, 4)
+
+
+def probe(src):
+    """{'duration': seconds, 'width': px, 'height': px} of a video; missing values are left out."""
+    atoms = _top_level_atoms(src)
+    moov = next(((offset, size) for kind, offset, size in atoms if kind == b'moov'), None)
+    if moov is None or moov[1] > MAX_MOOV_SIZE:
+        return {}
+    src.seek(moov[0])
+    data = src.read(moov[1])
+    header = 16 if struct.unpack_from('>I', data)[0] == 1 else 8
+
+    info = {}
+    for kind, payload in _children(data[header:]):
+        if kind == b'mvhd':
+            timescale, duration = _full_box(payload, '>8xII', '>16xIQ')
+            if timescale:
+                info['duration'] = round(duration / timescale, 3)
+        elif kind == b'trak' and 'width' not in info:
+            children = dict(_children(payload))
+            handler = None
+            for mdia_kind, mdia_payload in _children(children.get(b'mdia', b'')):
+                if mdia_kind == b'hdlr':
+                    handler = mdia_payload[8:12]
+            if handler != b'vide' or b'tkhd' not in children:
+                continue
+            tkhd = children[b'tkhd']
+            offset = 4 + (32 if tkhd[0] == 1 else 20) + 16  # times, ids, duration; layer..volume
+            matrix = struct.unpack_from('>9i', tkhd, offset)
+            width, height = (value >> 16 for value in struct.unpack_from('>II', tkhd, offset + 36))
+            if matrix[0] == 0 and matrix[4] == 0:  # rotated 90/270 degrees
+                width, height = height, width
+            if width and height:
+                info['width'], info['height'] = width, height
+    return info
@@ -0,0 +1,138 @@
+"""Full-page cache for anonymous views of the public pages.
+
+Most traffic is anonymous visitors on the home feed, category pages and
+business profiles, and they all get the same HTML. ``serve_cached_page``
+(before_request) answers those requests straight from memory, so a hit never
+opens a MySQL connection or renders a template. ``store_page`` (after_request)
+saves fresh responses (pages and the /page/<n> redirects).
+
+Entries are keyed on path + sorted query string + a generation stamp. The
+stamp is the mtime of a file shared by every worker, so one bump purges every
+worker's entries. Every public page embeds the feed, the navbar categories or
+the "similar businesses" block, so any business, category or plan change bumps
+it. Writes call ``invalidate_pages`` before committing, and the bump happens at
+teardown, after the commit, so a concurrent request can't re-cache the old
+data.
+
+Requests with anything in the session (logged in, pending flash messages)
+bypass the cache both ways.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app as app, g, has_request_context, request, session
+
+# Views whose anonymous GET responses are cacheable
+CACHEABLE_ENDPOINTS = {
+    'index.home',
+    'index.home_page',  # redirects to the equivalent cursor URL
+    'categories.businesses_by_category',
+    'business.public_business_profile',
+}
+
+# Redirects carry no session changes here (a flash would make the session
+# non-empty), so they are as cacheable as the pages themselves.
+CACHEABLE_STATUSES = {200, 301, 302}
+
+_lock = threading.Lock()
+_pages = OrderedDict()  # key -> (expires_at, status, headers, body)
+
+
+def _stamp_path():
+    path = app.config.get('PAGE_CACHE_STAMP_FILE')
+    return path or os.path.join(app.instance_path, 'page_cache.stamp')
+
+
+def _generation():
+    try:
+        return os.stat(_stamp_path()).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def bump_page_generation():
+    """Invalidate every worker's cached pages now."""
+    path = _stamp_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    now = time.time_ns()
+    with open(path, 'a'):
+        os.utime(path, ns=(now, now))
+    with _lock:
+        _pages.clear()
+
+
+def invalidate_pages():
+    """Purge cached pages once the current request has committed.
+
+    Outside a request (CLI commands) the purge happens immediately.
+    """
+    if has_request_context():
+        g.purge_pages = True
+    else:
+        bump_page_generation()
+
+
+def flush_page_invalidation(exc=None):
+    """Teardown hook: apply an ``invalidate_pages`` requested during the request."""
+    if g.pop('purge_pages', False):
+        bump_page_generation()
+
+
+def _cache_key():
+    if not app.config.get('PAGE_CACHE_ENABLED'):
+        return None
+    if request.method not in ('GET', 'HEAD') or request.endpoint not in CACHEABLE_ENDPOINTS:
+        return None
+    if session:
+        return None
+    query = tuple(sorted(request.args.items(multi=True)))
+    return (_generation(), request.path, query)
+
+
+def serve_cached_page():
+    """before_request hook: answer anonymous public GETs from the cache."""
+    key = _cache_key()
+    if key is None:
+        return None
+    with _lock:
+        entry = _pages.get(key)
+        if entry and entry[0] > time.monotonic():
+            _pages.move_to_end(key)
+        else:
+            entry = None
+    if entry is None:
+        g.page_cache_key = key
+        return None
+
+    _expires, status, headers, body = entry
+    response = app.response_class(body, status=status, headers=headers)
+    response.headers['X-Cache'] = 'HIT'
+    return response
+
+
+def store_page(response):
+    """after_request hook: keep a fresh anonymous response for next time."""
+    key = g.pop('page_cache_key', None)
+    if key is None:
+        return response
+    response.headers['X-Cache'] = 'MISS'
+    if (
+        response.status_code not in CACHEABLE_STATUSES
+        or response.direct_passthrough
+        or response.is_streamed
+        or 'Set-Cookie' in response.headers
+        or session or session.modified  # the view flashed (even if already shown) or logged someone in
+        or g.get('purge_pages')
+    ):
+        return response
+
+    headers = [(k, v) for k, v in response.headers if k not in ('X-Cache', 'Server-Timing')]
+    entry = (time.monotonic() + app.config['PAGE_CACHE_TTL'], response.status_code, headers, response.get_data())
+    with _lock:
+        _pages[key] = entry
+        _pages.move_to_end(key)
+        while len(_pages) > app.config['PAGE_CACHE_MAX_ENTRIES']:
+            _pages.popitem(last=False)
+    return response
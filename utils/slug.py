@@ -1,5 +1,11 @@
 import re
 
+import mysql.connector
+from mysql.connector import errorcode
+
+# Attempts before allocate_slug gives up on a contended name
+SLUG_ATTEMPTS = 5
+
 def slugify(text: str) -> str:
     text = text.lower().strip()
     text = re.sub(r'[^a-z0-9\s-]', '', text)
@@ -7,12 +13,44 @@ def slugify(text: str) -> str:
     return text
 
 def generate_unique_slug(cur, base_slug):
-    slug = base_slug
-    counter = 1
+    """First free slug for ``base_slug``: itself, else one past the highest ``-N`` suffix.
+
+    One indexed range query, whatever the number of existing suffixes.
+    """
+    base_slug = base_slug or 'business'
+    cur.execute(
+        "SELECT slug FROM businesses WHERE slug = %s OR slug LIKE %s",
+        (base_slug, f"{base_slug}-%"),
+    )
+    rows = cur.fetchall()
+    taken = [row['slug'] if isinstance(row, dict) else row[0] for row in rows]
+    if base_slug not in taken:
+        return base_slug
+
+    suffix = re.compile(rf"{re.escape(base_slug)}-(\d+)")
+    highest = max((int(m.group(1)) for m in map(suffix.fullmatch, taken) if m), default=0)
+    return f"{base_slug}-{highest + 1}"
+
+def _next_suffix(base_slug, slug):
+    if slug == base_slug:
+        return f"{base_slug}-1"
+    return f"{base_slug}-{int(slug.rsplit('-', 1)[1]) + 1}"
+
+def allocate_slug(cur, base_slug, write):
+    """Call ``write(slug)`` with a free slug, retrying when a concurrent writer took it.
 
-    while True:
-        cur.execute("SELECT 1 FROM businesses WHERE slug = %s", (slug,))
-        if not cur.fetchone():
+    ``write`` runs the INSERT/UPDATE that stores the slug; the unique index on
+    ``businesses.slug`` turns a race into a duplicate-key error. Retries step
+    the suffix rather than re-querying, because under REPEATABLE READ the
+    transaction's snapshot can't see the row that beat us. Returns the slug.
+    """
+    base_slug = base_slug or 'business'
+    slug = generate_unique_slug(cur, base_slug)
+    for attempt in range(SLUG_ATTEMPTS):
+        try:
+            write(slug)
             return slug
-        slug = f"{base_slug}-{counter}"
-        counter += 1
+        except mysql.connector.IntegrityError as e:
+            if e.errno != errorcode.ER_DUP_ENTRY or 'slug' not in str(e) or attempt == SLUG_ATTEMPTS - 1:
+                raise
+            slug = _next_suffix(base_slug, slug)
@@ -0,0 +1,122 @@
+"""Minimal SMTP server for development and tests.
+
+Accepts any sender, recipient and credentials (AUTH PLAIN/LOGIN), keeps every
+received mail in ``messages`` and, given a ``maildir``, also writes it there
+as ``<timestamp>-<n>.eml``. Plain SMTP only, no TLS:
+
+    stub = SMTPStub('127.0.0.1', 0)
+    stub.start()                  # serve from a daemon thread
+    ...                           # MAIL_SERVER=127.0.0.1 MAIL_PORT=stub.port MAIL_USE_SSL=false
+    stub.messages[-1]['rcpt_to']
+    stub.shutdown()
+"""
+import itertools
+import logging
+import os
+import re
+import socketserver
+import threading
+import time
+
+_ADDRESS = re.compile(r'<([^>]*)>')
+
+
+def _address(arg):
+    match = _ADDRESS.search(arg)
+    return match.group(1) if match else arg.split(':', 1)[-1].strip()
+
+
+class SMTPStubHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def readline(self):
+        return self.rfile.readline().decode('utf-8', 'replace').rstrip('\r\n')
+
+    def handle(self):
+        self.reply('220 hfp_busy SMTP stub')
+        mail_from, rcpt_to = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command, _, arg = line.decode('utf-8', 'replace').rstrip('\r\n').partition(' ')
+            command = command.upper()
+
+            if command == 'EHLO':
+                self.wfile.write(b'250-hfp_busy\r\n250-8BITMIME\r\n250-AUTH PLAIN LOGIN\r\n250 SMTPUTF8\r\n')
+            elif command == 'HELO':
+                self.reply('250 hfp_busy')
+            elif command == 'AUTH':
+                mechanism, _, initial = arg.partition(' ')
+                if mechanism.upper() == 'LOGIN':
+                    for prompt in ('VXNlcm5hbWU6', 'UGFzc3dvcmQ6'):  # Username: / Password:
+                        self.reply(f'334 {prompt}')
+                        self.readline()
+                elif not initial:
+                    self.reply('334 ')
+                    self.readline()
+                self.reply('235 Authentication successful')
+            elif command == 'MAIL':
+                mail_from, rcpt_to = _address(arg), []
+                self.reply('250 OK')
+            elif command == 'RCPT':
+                rcpt_to.append(_address(arg))
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                while True:
+                    line = self.rfile.readline()
+                    if not line or line in (b'.\r\n', b'.\n'):
+                        break
+                    lines.append(line[1:] if line.startswith(b'..') else line)
+                self.server.store(mail_from, rcpt_to, b''.join(lines))
+                mail_from, rcpt_to = None, []
+                self.reply('250 OK: queued')
+            elif command == 'RSET':
+                mail_from, rcpt_to = None, []
+                self.reply('250 OK')
+            elif command == 'NOOP':
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SMTPStub(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=1025, maildir=None, logger=None):
+        super().__init__((host, port), SMTPStubHandler)
+        self.maildir = maildir
+        # Handlers run in their own threads, outside any app context
+        self.logger = logger or logging.getLogger(__name__)
+        self.messages = []
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+        if maildir:
+            os.makedirs(maildir, exist_ok=True)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def store(self, mail_from, rcpt_to, data):
+        with self._lock:
+            n = next(self._counter)
+            self.messages.append({'mail_from': mail_from, 'rcpt_to': list(rcpt_to), 'data': data})
+        if self.maildir:
+            path = os.path.join(self.maildir, f"{time.time_ns()}-{n}.eml")
+            with open(path, 'wb') as f:
+                f.write(data)
+        self.logger.info(f"SMTP stub received {mail_from} -> {', '.join(rcpt_to)} ({len(data)} bytes)")
+
+    def start(self):
+        """Serve from a daemon thread (for tests)."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
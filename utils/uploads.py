@@ -0,0 +1,180 @@
+"""Streaming multipart uploads.
+
+``UploadRequest`` replaces Werkzeug's file stream factory, which keeps up to
+500 KB per file in memory and spools the rest to ``/tmp``. Each uploaded
+file is instead written straight into ``<UPLOAD_FOLDER>/tmp`` by
+``UploadStream``, chunk by chunk as the multipart parser decodes it
+(``MultiPartParser.buffer_size``, 64 KB). The stream:
+
+- sniffs the magic bytes of the first chunk and rejects anything that isn't
+  a JPEG/PNG/GIF image or an MP4/MOV/AVI video with 415, before the rest of
+  the body is read;
+- enforces the cap for that kind (``UPLOAD_MAX_IMAGE_BYTES`` /
+  ``UPLOAD_MAX_VIDEO_BYTES``) as bytes arrive, with 413;
+- hashes while writing, so ``commit()`` can rename the temp file into the
+  content-addressed store (utils.media_store) without reading it again.
+
+The stored extension comes from the sniffed type, not the client's filename.
+An upload that is never committed is deleted when Flask closes the request.
+"""
+import hashlib
+import os
+import tempfile
+
+from flask import Request, current_app as app
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+from utils.media_store import place_stored, upload_dir
+
+# Enough for every signature below
+SNIFF_BYTES = 16
+
+# QuickTime files that predate the ftyp box start with one of these atoms
+QUICKTIME_ATOMS = {b'moov', b'mdat', b'wide', b'free', b'skip', b'pnot'}
+
+# ftyp major brands accepted as video; the rest of ISO-BMFF (HEIC, AVIF,
+# 3GP, ...) is rejected
+MP4_BRANDS = {b'isom', b'iso2', b'iso4', b'iso5', b'iso6', b'mp41', b'mp42', b'avc1', b'M4V ', b'dash'}
+QUICKTIME_BRAND = b'qt  '
+
+VIDEO_EXTENSIONS = {'mp4', 'mov', 'avi'}
+
+
+def sniff(head):
+    """(kind, extension) from a file's first bytes, or None when unsupported."""
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image', 'jpg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image', 'png'
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image', 'gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'AVI ':
+        return 'video', 'avi'
+    if head[4:8] == b'ftyp':
+        brand = head[8:12]
+        if brand == QUICKTIME_BRAND:
+            return 'video', 'mov'
+        return ('video', 'mp4') if brand in MP4_BRANDS else None
+    if head[4:8] in QUICKTIME_ATOMS:
+        return 'video', 'mov'
+    return None
+
+
+def upload_media_type(file):
+    """'video' or 'image' for an uploaded FileStorage.
+
+    The type sniffed while streaming, never the client's Content-Type; for
+    streams that weren't sniffed, the filename's extension.
+    """
+    kind = getattr(file.stream, 'kind', None)
+    if kind:
+        return kind
+    return 'video' if (file.filename or '').rsplit('.', 1)[-1].lower() in VIDEO_EXTENSIONS else 'image'
+
+
+class UploadStream:
+    """Writable/readable file object the multipart parser streams one upload into."""
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        self.kind = self.extension = None
+        self.size = 0
+        self.committed = None
+        self._head = b''
+        self._sha = hashlib.sha256()
+        self._file = None
+        self._path = None
+
+    def _open(self):
+        tmp_dir = os.path.join(upload_dir(), 'tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, self._path = tempfile.mkstemp(dir=tmp_dir, suffix='.part')
+        self._file = os.fdopen(fd, 'w+b')
+
+    def _reject(self, error):
+        app.logger.info(f"Rejected upload {self.filename!r}: {error.description}")
+        self.close()
+        raise error
+
+    def _sniff(self):
+        detected = sniff(self._head)
+        if detected is None:
+            self._reject(UnsupportedMediaType('Only JPEG, PNG and GIF images or MP4, MOV and AVI videos can be uploaded.'))
+        self.kind, self.extension = detected
+
+    def _check_size(self):
+        if self.kind is None:
+            return
+        limit = app.config['UPLOAD_MAX_VIDEO_BYTES' if self.kind == 'video' else 'UPLOAD_MAX_IMAGE_BYTES']
+        if self.size > limit:
+            self._reject(RequestEntityTooLarge(f'{self.kind.title()} uploads are limited to {limit // (1024 * 1024)} MB.'))
+
+    def write(self, data):
+        if not data:
+            return 0
+        if self._file is None:
+            self._open()
+        if self.kind is None:
+            self._head += data[:SNIFF_BYTES - len(self._head)]
+            if len(self._head) >= SNIFF_BYTES:
+                self._sniff()
+        self.size += len(data)
+        self._check_size()
+        self._sha.update(data)
+        return self._file.write(data)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if self.kind is None and self._head:
+            self._sniff()  # the whole upload was shorter than SNIFF_BYTES
+            self._check_size()
+        return self._file.seek(offset, whence) if self._file else 0
+
+    def tell(self):
+        return self._file.tell() if self._file else 0
+
+    def read(self, size=-1):
+        return self._file.read(size) if self._file else b''
+
+    def readline(self, size=-1):
+        return self._file.readline(size) if self._file else b''
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def __iter__(self):
+        return iter(self._file or ())
+
+    @property
+    def closed(self):
+        return self._file is None or self._file.closed
+
+    def commit(self):
+        """Move the upload into the store; returns its relative path there."""
+        if self.committed is None:
+            if self._file is None or self.kind is None:
+                raise UnsupportedMediaType('Empty upload.')
+            self._file.close()
+            self.committed = place_stored(self._path, self._sha.hexdigest(), self.extension)
+            self._path = None
+        return self.committed
+
+    def close(self):
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+        if self._path is not None:
+            try:
+                os.unlink(self._path)
+            except FileNotFoundError:
+                pass
+            self._path = None
+
+
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return UploadStream(filename)
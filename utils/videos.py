@@ -0,0 +1,36 @@
+"""Metadata for uploaded videos.
+
+Videos have no variants, so their ``media_variants`` / ``media_variants_2``
+column holds what templates need to size a player and label it without
+fetching the file:
+
+    {"video": {"duration": 12.48, "width": 1280, "height": 720}}
+
+Only MP4/MOV are probed (utils.mp4); for other files, or when the file
+can't be parsed, nothing is stored.
+"""
+import json
+import os
+import struct
+
+from flask import current_app as app
+
+from utils.media_store import upload_dir
+from utils.mp4 import FASTSTART_EXTENSIONS, probe
+
+
+def video_metadata(media_url):
+    """Probe an uploaded video from its URL; returns JSON for the DB, or None."""
+    if not media_url or '/static/uploads/' not in media_url:
+        return None
+    relative = media_url.split('/static/uploads/', 1)[1]
+    if relative.rsplit('.', 1)[-1].lower() not in FASTSTART_EXTENSIONS:
+        return None
+    path = os.path.join(upload_dir(), relative)
+    try:
+        with open(path, 'rb') as f:
+            info = probe(f)
+    except (OSError, ValueError, struct.error) as e:
+        app.logger.warning(f"Could not read video metadata from {path}: {e}")
+        return None
+    return json.dumps({'video': info}, separators=(',', ':')) if info else None